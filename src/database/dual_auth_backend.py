@@ -6,49 +6,64 @@ Soporte para autenticación tradicional y biométrica
 
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import base64
 import json
+import math
+import secrets
 import uuid
+import numpy as np
 from datetime import datetime
 import bcrypt
 import sys
 import os
+import time
+import queue
+import logging
+import threading
 
 # Importar configuración de base de datos
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'config'))
 from database_config import get_database_config
 
+# Importar el kernel siempre bajo el mismo nombre de módulo que usa la UI
+# (database._bio_kernel); dos nombres distintos materializan dos copias del
+# módulo y el warm-up en segundo plano solo pre-compilaría una de ellas
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from database._bio_kernel import nearest_l2, warmup as _bio_warmup
+
+logger = logging.getLogger("dual_auth.db")
+
 class DualAuthDatabase:
     def get_auth_logs(self, limit=50, user_id=None, email=None):
         """Obtener historial de autenticaciones desde la tabla auth_logs"""
-        if not self.connection:
-            self.connect()
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            query = "SELECT id, user_id, email, auth_method, status, failure_reason, ip_address, timestamp FROM auth_logs"
-            params = []
-            filters = []
-            if user_id:
-                filters.append("user_id = %s")
-                params.append(user_id)
-            if email:
-                filters.append("email = %s")
-                params.append(email)
-            if filters:
+            with self._cursor(dictionary=True) as cursor:
+                query = "SELECT id, user_id, email, auth_method, status, failure_reason, ip_address, timestamp FROM auth_logs"
+                params = []
+                filters = []
+                if user_id:
+                    filters.append("user_id = %s")
+                    params.append(user_id)
+                if email:
+                    filters.append("email = %s")
+                    params.append(email)
+                if not filters:
+                    # Sin filtros: acotar a 90 días para que MySQL pode particiones
+                    filters.append("timestamp > NOW() - INTERVAL 90 DAY")
                 query += " WHERE " + " AND ".join(filters)
-            query += " ORDER BY timestamp DESC LIMIT %s"
-            params.append(limit)
-            cursor.execute(query, tuple(params))
-            logs = cursor.fetchall()
-            return logs
+                query += " ORDER BY timestamp DESC LIMIT %s"
+                params.append(limit)
+                cursor.execute(query, tuple(params))
+                return cursor.fetchall()
         except Error as e:
             print(f"Error al obtener historial de autenticaciones: {e}")
             return []
-        finally:
-            if cursor:
-                cursor.close()
     """Base de datos expandida para autenticación dual"""
-    
+
     def __init__(self):
         # Obtener configuración de base de datos
         try:
@@ -65,47 +80,129 @@ class DualAuthDatabase:
             self.user = 'root'
             self.password = 'Johan12315912'
             self.port = 3306
-        
-        self.connection = None
-    
-    def connect(self, use_database=True):
-        try:
-            self.connection = mysql.connector.connect(
+
+        # Pool de conexiones (creado perezosamente: la BD puede no existir aún)
+        self._pool = None
+
+        # Pool de hilos para bcrypt: libera el GIL dentro de C, así logins
+        # concurrentes se verifican en paralelo en varios núcleos
+        self._pw_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+        # Cola de logs de autenticación: los INSERT se agrupan en lotes fuera
+        # del camino crítico del login
+        self._log_q = queue.Queue(maxsize=10000)
+        self._log_stop = threading.Event()
+        threading.Thread(target=self._log_flush_loop, daemon=True).start()
+
+        # Pre-compilar el kernel de distancias en segundo plano para que el
+        # primer login biométrico no pague el costo del JIT de Numba
+        threading.Thread(target=_bio_warmup, daemon=True).start()
+
+        # Cache SoA de biometría: matriz contigua (N, 128) float32 + metadatos paralelos
+        self._bio_matrix = None
+        self._bio_meta = []
+        # Firma (COUNT, MAX(registration_date)) y timestamp del último poll del cache
+        self._bio_signature = None
+        self._bio_cache_ts = 0.0
+        # Prefiltro PCA (solo se ajusta con suficientes usuarios enrolados)
+        self._bio_proj = None
+        self._bio_matrix16 = None
+        self._bio_mean = None
+
+    # Segundos entre polls de frescura del cache biométrico
+    BIO_CACHE_TTL = 30.0
+
+    # Tamaño máximo de lote y espera máxima (segundos) al volcar logs
+    LOG_FLUSH_BATCH = 200
+    LOG_FLUSH_INTERVAL = 0.2
+
+    # Prefiltro PCA: dimensiones gruesas, candidatos a refinar y mínimo de
+    # usuarios para que el prefiltro valga la pena
+    BIO_PCA_DIM = 16
+    BIO_PCA_TOP_K = 8
+    BIO_PCA_MIN_USERS = 64
+
+    # Conexiones simultáneas del pool
+    POOL_SIZE = 16
+
+    def _get_pool(self):
+        """Obtener (creando si es necesario) el pool de conexiones"""
+        if self._pool is None:
+            self._pool = MySQLConnectionPool(
+                pool_name='auth',
+                pool_size=self.POOL_SIZE,
                 host=self.host,
-                database=self.database if use_database else None,
+                database=self.database,
                 user=self.user,
                 password=self.password,
                 autocommit=True
             )
-            
-            if self.connection.is_connected():
-                print(f"✅ Conectado a MySQL: {self.database if use_database else 'servidor'}")
-                return True
-                
-        except Error as e:
-            print(f"❌ Error conectando a MySQL: {e}")
-            return False
-    
+            print(f"✅ Pool de conexiones MySQL creado: {self.database}")
+        return self._pool
+
+    @contextmanager
+    def _cursor(self, dictionary=False, prepared=False):
+        """Adquirir una conexión del pool y entregar un cursor ya gestionado.
+
+        Con prepared=True el cursor usa el protocolo binario
+        (COM_STMT_PREPARE/EXECUTE), evitando re-parsear el SQL de las
+        consultas calientes y enviando solo los parámetros.
+        """
+        connection = self._get_pool().get_connection()
+        if prepared:
+            cursor = connection.cursor(prepared=True)
+        else:
+            cursor = connection.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            connection.close()  # Devuelve la conexión al pool
+
+    @staticmethod
+    def _auth_log_partitions(months=12):
+        """Generar particiones mensuales para auth_logs desde el mes actual,
+        más una partición MAXVALUE para todo lo posterior"""
+        partitions = []
+        year = datetime.now().year
+        month = datetime.now().month
+        for _ in range(months):
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+            boundary = f"{year:04d}-{month:02d}-01"
+            partitions.append(
+                f"PARTITION p{year:04d}{month:02d} VALUES LESS THAN (TO_DAYS('{boundary}'))"
+            )
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        return ",\n                ".join(partitions)
+
     def create_database_and_tables(self):
         """Crear base de datos y todas las tablas necesarias"""
+        connection = None
+        cursor = None
         try:
-            # Conectar sin especificar base de datos
-            if not self.connect(use_database=False):
-                return False
-            
-            cursor = self.connection.cursor()
-            
+            # Conectar sin especificar base de datos (puede no existir todavía)
+            connection = mysql.connector.connect(
+                host=self.host,
+                user=self.user,
+                password=self.password,
+                autocommit=True
+            )
+            cursor = connection.cursor()
+
             # Crear base de datos
             cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
             print(f"✅ Base de datos '{self.database}' creada/verificada")
-            
+
             # Usar la base de datos
             cursor.execute(f"USE {self.database}")
-            
+
             # Tabla principal de usuarios
             create_users_table = """
             CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR(64) PRIMARY KEY,
+                id CHAR(32) PRIMARY KEY,
                 email VARCHAR(255) UNIQUE NOT NULL,
                 username VARCHAR(100) NOT NULL,
                 password_hash VARCHAR(255) NOT NULL,
@@ -122,13 +219,14 @@ class DualAuthDatabase:
                 locked_until TIMESTAMP NULL
             )
             """
-            
+
             # Tabla de datos biométricos (separada para seguridad)
             create_biometric_table = """
             CREATE TABLE IF NOT EXISTS user_biometrics (
-                id VARCHAR(64) PRIMARY KEY,
-                user_id VARCHAR(64) NOT NULL,
-                face_encoding TEXT NOT NULL,
+                id CHAR(32) PRIMARY KEY,
+                user_id CHAR(32) NOT NULL,
+                face_encoding VARBINARY(128) NOT NULL,
+                encoding_scale FLOAT NOT NULL DEFAULT 1.0,
                 face_model_version VARCHAR(20) DEFAULT 'v1.0',
                 registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 last_verification TIMESTAMP NULL,
@@ -138,12 +236,14 @@ class DualAuthDatabase:
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
             )
             """
-            
-            # Tabla de sesiones
+
+            # Tabla de sesiones. El id es un token binario de 32 bytes del
+            # CSPRNG del sistema: clave 4x más angosta que el VARCHAR(128)
+            # anterior y sin formateo/parseo de UUID en cada búsqueda
             create_sessions_table = """
             CREATE TABLE IF NOT EXISTS user_sessions (
-                session_id VARCHAR(128) PRIMARY KEY,
-                user_id VARCHAR(64) NOT NULL,
+                session_id BINARY(32) PRIMARY KEY,
+                user_id CHAR(32) NOT NULL,
                 auth_method ENUM('password', 'biometric', 'dual') NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 expires_at TIMESTAMP NOT NULL,
@@ -153,131 +253,217 @@ class DualAuthDatabase:
                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
             )
             """
-            
-            # Tabla de logs de autenticación
+
+            # Tabla de logs de autenticación, particionada por mes para que las
+            # consultas recientes (y las purgas de retención) toquen pocas particiones.
+            # El PK incluye timestamp porque MySQL exige la columna de partición
+            # en toda clave única.
             create_auth_logs_table = """
             CREATE TABLE IF NOT EXISTS auth_logs (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id VARCHAR(64),
+                id INT AUTO_INCREMENT,
+                user_id CHAR(32),
                 email VARCHAR(255),
                 auth_method ENUM('password', 'biometric', 'registration') NOT NULL,
                 status ENUM('success', 'failed', 'blocked') NOT NULL,
                 failure_reason VARCHAR(255),
                 ip_address VARCHAR(45),
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, timestamp),
                 INDEX idx_user_timestamp (user_id, timestamp),
-                INDEX idx_email_timestamp (email, timestamp)
+                INDEX idx_email_timestamp (email, timestamp),
+                INDEX idx_timestamp (timestamp)
+            )
+            PARTITION BY RANGE (TO_DAYS(timestamp)) (
+            """ + self._auth_log_partitions() + """
             )
             """
-            
+
             # Ejecutar creación de tablas
-            for table_query in [create_users_table, create_biometric_table, 
+            for table_query in [create_users_table, create_biometric_table,
                               create_sessions_table, create_auth_logs_table]:
                 cursor.execute(table_query)
-            
+
+            # El SELECT de login ya se resuelve con el UNIQUE(email); el
+            # índice idx_users_auth de versiones anteriores nunca llegó a
+            # cubrir la consulta (faltaban username/first_name/last_name) y
+            # encima incluía login_attempts/locked_until, reescritos en cada
+            # intento de login. Eliminarlo si quedó de una instalación previa
+            try:
+                cursor.execute("DROP INDEX idx_users_auth ON users")
+            except Error:
+                pass  # Nunca existió
+
+            # Migración de user_biometrics para instalaciones previas al
+            # almacenamiento cuantizado (CREATE TABLE IF NOT EXISTS no
+            # agrega columnas ni cambia tipos en tablas existentes)
+            try:
+                cursor.execute("""
+                    ALTER TABLE user_biometrics
+                    ADD COLUMN encoding_scale FLOAT NOT NULL DEFAULT 1.0
+                    AFTER face_encoding
+                """)
+            except Error:
+                pass  # Ya existe
+            try:
+                # Los encodings legacy en TEXT no son legibles por el
+                # pipeline actual de todos modos (requieren re-registro);
+                # si quedan filas que no caben en 128 bytes el MODIFY
+                # falla y se reintenta tras limpiarlas
+                cursor.execute("""
+                    ALTER TABLE user_biometrics
+                    MODIFY face_encoding VARBINARY(128) NOT NULL
+                """)
+            except Error:
+                try:
+                    cursor.execute("DELETE FROM user_biometrics")
+                    cursor.execute("UPDATE users SET face_registered = FALSE, biometric_enabled = FALSE")
+                    cursor.execute("""
+                        ALTER TABLE user_biometrics
+                        MODIFY face_encoding VARBINARY(128) NOT NULL
+                    """)
+                    print("⚠️ Encodings biométricos legacy descartados - se requiere re-registro")
+                except Error:
+                    pass  # Ya es VARBINARY o la tabla no existe aún
+
+            # Índices de auth_logs para instalaciones previas: get_auth_logs
+            # filtra por usuario/email y acota por timestamp, y sin estos
+            # índices esas consultas barren la tabla completa. El particionado
+            # mensual y el PK (id, timestamp) quedan solo para instalaciones
+            # nuevas (reconstruir el PK de una tabla poblada no es DDL
+            # best-effort); con idx_timestamp el recorte de 90 días sigue
+            # siendo barato aunque no haya poda de particiones
+            for index_ddl in (
+                "CREATE INDEX idx_timestamp ON auth_logs (timestamp)",
+                "CREATE INDEX idx_user_timestamp ON auth_logs (user_id, timestamp)",
+                "CREATE INDEX idx_email_timestamp ON auth_logs (email, timestamp)",
+            ):
+                try:
+                    cursor.execute(index_ddl)
+                except Error:
+                    pass  # Ya existe
+
             print("✅ Todas las tablas creadas/verificadas correctamente")
             return True
-            
+
         except Error as e:
             print(f"❌ Error creando base de datos: {e}")
             return False
         finally:
-            if self.connection and self.connection.is_connected():
+            if cursor:
                 cursor.close()
-    
-    def hash_password(self, password: str) -> str:
-        """Hashear contraseña con bcrypt"""
+            if connection and connection.is_connected():
+                connection.close()
+
+    @staticmethod
+    def _prehash_password(password: str) -> bytes:
+        """Pre-hashear la contraseña con SHA-256 (acelerado por hardware vía
+        OpenSSL) antes de bcrypt; evita además el truncado a 72 bytes de bcrypt"""
+        digest = hashlib.sha256(password.encode('utf-8')).digest()
+        return base64.b64encode(digest)
+
+    def _hash_password_sync(self, password: str) -> str:
         salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-    
+        return bcrypt.hashpw(self._prehash_password(password), salt).decode('utf-8')
+
+    def _verify_password_sync(self, password: str, hashed: str) -> bool:
+        hashed_bytes = hashed.encode('utf-8')
+        if bcrypt.checkpw(self._prehash_password(password), hashed_bytes):
+            return True
+        # Hashes creados antes del esquema con pre-hash
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_bytes)
+
+    def hash_password(self, password: str) -> str:
+        """Hashear contraseña con bcrypt sobre un pre-hash SHA-256"""
+        return self._pw_pool.submit(self._hash_password_sync, password).result()
+
     def verify_password(self, password: str, hashed: str) -> bool:
-        """Verificar contraseña"""
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    
-    def register_user(self, email: str, username: str, password: str, 
+        """Verificar contraseña (con compatibilidad para hashes antiguos sin pre-hash)"""
+        return self._pw_pool.submit(self._verify_password_sync, password, hashed).result()
+
+    def register_user(self, email: str, username: str, password: str,
                      first_name: str = None, last_name: str = None, phone: str = None, ip_address: str = None) -> dict:
         """Registrar nuevo usuario"""
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor()
-            
-            # Verificar si el email ya existe
-            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-            if cursor.fetchone():
-                return {"success": False, "error": "El email ya está registrado"}
-            
-            # Crear nuevo usuario
-            user_id = str(uuid.uuid4())
-            password_hash = self.hash_password(password)
-            
-            insert_query = """
-            INSERT INTO users (id, email, username, password_hash, first_name, last_name, phone)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (user_id, email, username, password_hash, 
-                                        first_name, last_name, phone))
-            
+            with self._cursor() as cursor:
+                # Verificar si el email ya existe
+                cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+                if cursor.fetchone():
+                    return {"success": False, "error": "El email ya está registrado"}
+
+                # Crear nuevo usuario
+                user_id = uuid.uuid4().hex  # 32 hex, sin guiones: claves más compactas en el B-tree
+                password_hash = self.hash_password(password)
+
+                insert_query = """
+                INSERT INTO users (id, email, username, password_hash, first_name, last_name, phone)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """
+
+                cursor.execute(insert_query, (user_id, email, username, password_hash,
+                                            first_name, last_name, phone))
+
             # Log del registro
             self.log_auth_attempt(user_id, email, 'registration', 'success', ip_address=ip_address)
-            
+
             return {
-                "success": True, 
+                "success": True,
                 "user_id": user_id,
                 "message": "Usuario registrado exitosamente"
             }
-            
+
         except Error as e:
             return {"success": False, "error": f"Error en registro: {e}"}
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def authenticate_user(self, email: str, password: str, ip_address: str = None) -> dict:
         """Autenticar usuario con email y contraseña"""
+        user_columns = ('id', 'email', 'username', 'password_hash', 'first_name', 'last_name',
+                        'is_active', 'login_attempts', 'locked_until', 'face_registered',
+                        'is_locked')
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor(dictionary=True)
-            
-            # Obtener usuario
-            cursor.execute("""
-                SELECT id, email, username, password_hash, first_name, last_name, is_active, 
-                       login_attempts, locked_until, face_registered
-                FROM users WHERE email = %s
-            """, (email,))
-            
-            user = cursor.fetchone()
-            
+            with self._cursor(prepared=True) as cursor:
+                # Obtener usuario (consulta caliente: statement preparado).
+                # is_locked se evalúa en MySQL con su propio reloj: un solo
+                # round trip y sin desfases con la hora del cliente
+                cursor.execute("""
+                    SELECT id, email, username, password_hash, first_name, last_name, is_active,
+                           login_attempts, locked_until, face_registered,
+                           (locked_until IS NOT NULL AND locked_until > NOW()) AS is_locked
+                    FROM users WHERE email = %s
+                """, (email,))
+
+                row = cursor.fetchone()
+                if row:
+                    # Algunas versiones 8.0.x del connector devuelven
+                    # bytearray (no str) para VARCHAR por el protocolo
+                    # binario; normalizar antes de usar los valores
+                    row = tuple(v.decode('utf-8') if isinstance(v, (bytes, bytearray)) else v
+                                for v in row)
+                user = dict(zip(user_columns, row)) if row else None
+
             if not user:
                 self.log_auth_attempt(None, email, 'password', 'failed', 'User not found', ip_address=ip_address)
                 return {"success": False, "error": "Credenciales inválidas"}
-            
+
             # Verificar si está bloqueado
-            if user['locked_until'] and datetime.now() < user['locked_until']:
+            if user['is_locked']:
                 self.log_auth_attempt(user['id'], email, 'password', 'blocked', 'Account locked', ip_address=ip_address)
                 return {"success": False, "error": "Cuenta temporalmente bloqueada"}
-            
+
             # Verificar si está activo
             if not user['is_active']:
                 self.log_auth_attempt(user['id'], email, 'password', 'failed', 'Account disabled', ip_address=ip_address)
                 return {"success": False, "error": "Cuenta desactivada"}
-            
+
             # Verificar contraseña
             if not self.verify_password(password, user['password_hash']):
                 # Incrementar intentos fallidos
                 self.increment_login_attempts(user['id'])
                 self.log_auth_attempt(user['id'], email, 'password', 'failed', 'Wrong password', ip_address=ip_address)
                 return {"success": False, "error": "Credenciales inválidas"}
-            
-            # Autenticación exitosa
-            self.reset_login_attempts(user['id'])
-            self.update_last_login(user['id'])
-            self.log_auth_attempt(user['id'], email, 'password', 'success', ip_address=ip_address)
-            
+
+            # Autenticación exitosa: un solo round trip para todos los efectos
+            self._finalize_auth_success(user['id'], email, 'password', ip_address)
+
             return {
                 "success": True,
                 "user": {
@@ -289,145 +475,191 @@ class DualAuthDatabase:
                     "face_registered": bool(user['face_registered'])
                 }
             }
-            
+
         except Error as e:
             return {"success": False, "error": f"Error en autenticación: {e}"}
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def register_face_biometric(self, user_id: str, face_encoding: list) -> dict:
         """Registrar datos biométricos del rostro"""
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor()
-            
-            # Convertir numpy array a lista si es necesario
-            if hasattr(face_encoding, 'tolist'):
-                face_encoding = face_encoding.tolist()
-            
-            print(f"🔄 DEBUG: Registrando biometría para usuario {user_id}")
-            print(f"🔄 DEBUG: Encoding length: {len(face_encoding)}")
-            
-            # Verificar si ya tiene biometría registrada
-            cursor.execute("SELECT id FROM user_biometrics WHERE user_id = %s", (user_id,))
-            existing = cursor.fetchone()
-            
-            biometric_id = str(uuid.uuid4())
-            encoding_json = json.dumps(face_encoding)
-            
-            if existing:
-                print("🔄 DEBUG: Actualizando biometría existente")
-                # Actualizar existente
-                cursor.execute("""
-                    UPDATE user_biometrics 
-                    SET face_encoding = %s, registration_date = CURRENT_TIMESTAMP
-                    WHERE user_id = %s
-                """, (encoding_json, user_id))
-            else:
-                print("🔄 DEBUG: Creando nuevo registro biométrico")
-                # Crear nuevo registro
+            # Cuantizar a int8 simétrico (escala max-abs por vector): 128 bytes por encoding
+            encoding_f32 = np.asarray(face_encoding, dtype=np.float32)
+            scale = float(np.max(np.abs(encoding_f32))) / 127.0
+            if scale == 0.0:
+                scale = 1.0
+            encoding_blob = np.round(encoding_f32 / scale).astype(np.int8).tobytes()
+
+            logger.debug("Registrando biometría para usuario %s", user_id)
+            logger.debug("Encoding length: %d, escala: %.6f", len(encoding_blob), scale)
+
+            with self._cursor() as cursor:
+                # Verificar si ya tiene biometría registrada
+                cursor.execute("SELECT id FROM user_biometrics WHERE user_id = %s", (user_id,))
+                existing = cursor.fetchone()
+
+                biometric_id = uuid.uuid4().hex
+
+                if existing:
+                    logger.debug("Actualizando biometría existente")
+                    # Actualizar existente
+                    cursor.execute("""
+                        UPDATE user_biometrics
+                        SET face_encoding = %s, encoding_scale = %s, registration_date = CURRENT_TIMESTAMP
+                        WHERE user_id = %s
+                    """, (encoding_blob, scale, user_id))
+                else:
+                    logger.debug("Creando nuevo registro biométrico")
+                    # Crear nuevo registro
+                    cursor.execute("""
+                        INSERT INTO user_biometrics (id, user_id, face_encoding, encoding_scale)
+                        VALUES (%s, %s, %s, %s)
+                    """, (biometric_id, user_id, encoding_blob, scale))
+
+                # Actualizar flags en usuario
+                logger.debug("Actualizando flags face_registered y biometric_enabled en usuario")
                 cursor.execute("""
-                    INSERT INTO user_biometrics (id, user_id, face_encoding)
-                    VALUES (%s, %s, %s)
-                """, (biometric_id, user_id, encoding_json))
-            
-            # Actualizar flags en usuario
-            print("🔄 DEBUG: Actualizando flags face_registered y biometric_enabled en usuario")
-            cursor.execute("""
-                UPDATE users SET face_registered = TRUE, biometric_enabled = TRUE WHERE id = %s
-            """, (user_id,))
-            
-            # ¡IMPORTANTE! Hacer commit de los cambios
-            self.connection.commit()
-            print("✅ DEBUG: Commit realizado exitosamente")
-            
-            cursor.close()
-            
+                    UPDATE users SET face_registered = TRUE, biometric_enabled = TRUE WHERE id = %s
+                """, (user_id,))
+
+            # Invalidar cache SoA para que el próximo login lo reconstruya
+            self._bio_matrix = None
+            self._bio_meta = []
+
             return {"success": True, "message": "Biometría registrada exitosamente"}
-            
+
         except Error as e:
-            print(f"❌ DEBUG: Error MySQL en register_face_biometric: {e}")
-            if self.connection:
-                self.connection.rollback()
+            logger.error("Error MySQL en register_face_biometric: %s", e)
             return {"success": False, "error": f"Error registrando biometría: {e}"}
         except Exception as e:
-            print(f"❌ DEBUG: Error general en register_face_biometric: {e}")
-            if self.connection:
-                self.connection.rollback()
+            logger.error("Error general en register_face_biometric: %s", e)
             return {"success": False, "error": f"Error inesperado: {e}"}
-    
-    def authenticate_biometric(self, face_encoding: list, threshold: float = 0.6, ip_address: str = None) -> dict:
-        """Autenticar usuario por biometría facial"""
-        try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor(dictionary=True)
-            
-            # Debug: Verificar el encoding recibido
-            print(f"🔍 DEBUG: Intentando autenticación biométrica")
-            print(f"🔍 DEBUG: Encoding recibido: {len(face_encoding)} dimensiones")
-            print(f"🔍 DEBUG: Umbral de confianza: {threshold}")
-            
-            # Obtener todos los usuarios con biometría activa
+
+    def _refresh_bio_cache(self):
+        """Reconstruir el cache SoA de encodings biométricos desde la base de datos"""
+        with self._cursor(dictionary=True) as cursor:
             cursor.execute("""
-                SELECT b.user_id, b.face_encoding, u.email, u.username, u.first_name, u.last_name, u.is_active, u.face_registered, u.biometric_enabled
+                SELECT b.user_id, b.face_encoding, b.encoding_scale, u.email, u.username, u.first_name, u.last_name, u.is_active, u.face_registered, u.biometric_enabled
                 FROM user_biometrics b
                 JOIN users u ON b.user_id = u.id
                 WHERE b.is_active = TRUE AND u.is_active = TRUE AND u.biometric_enabled = TRUE
             """)
-            
-            biometric_users = cursor.fetchall()
-            
-            print(f"🔍 DEBUG: Usuarios con biometría encontrados: {len(biometric_users)}")
-            
-            if not biometric_users:
-                print("❌ DEBUG: No hay usuarios con biometría registrada y activa")
+            rows = cursor.fetchall()
+
+        if not rows:
+            self._bio_matrix = np.empty((0, 0), dtype=np.float32)
+            self._bio_meta = []
+            self._fit_bio_prefilter()
+            return
+
+        # Decuantizar cada BLOB int8 (q * escala) sobre una fila preasignada;
+        # el costo se paga una sola vez por reconstrucción del cache
+        dim = len(rows[0]['face_encoding'])
+        matrix = np.empty((len(rows), dim), dtype=np.float32)
+        meta = []
+        for i, row in enumerate(rows):
+            quantized = np.frombuffer(row['face_encoding'], dtype=np.int8)
+            matrix[i, :] = quantized.astype(np.float32) * row['encoding_scale']
+            meta.append(row)
+
+        self._bio_matrix = np.ascontiguousarray(matrix)
+        self._bio_meta = meta
+        self._fit_bio_prefilter()
+        logger.debug("Cache biométrico reconstruido: %d usuarios, %d dimensiones", len(meta), dim)
+
+    def _fit_bio_prefilter(self):
+        """Ajustar la proyección PCA de 16 dimensiones usada como prefiltro grueso.
+
+        Solo se activa con suficientes usuarios enrolados; con pocos, el escaneo
+        completo de 128 dimensiones ya es trivial.
+        """
+        matrix = self._bio_matrix
+        if matrix.shape[0] < self.BIO_PCA_MIN_USERS:
+            self._bio_proj = None
+            self._bio_matrix16 = None
+            self._bio_mean = None
+            return
+
+        # PCA vía SVD de la matriz centrada (sin dependencia de sklearn)
+        self._bio_mean = matrix.mean(axis=0)
+        centered = matrix - self._bio_mean
+        _, _, vt = np.linalg.svd(centered, full_matrices=False)
+        self._bio_proj = np.ascontiguousarray(vt[:self.BIO_PCA_DIM].T.astype(np.float32))
+        self._bio_matrix16 = np.ascontiguousarray(centered @ self._bio_proj)
+
+    def _ensure_bio_cache(self):
+        """Garantizar que el cache SoA esté poblado y razonablemente fresco.
+
+        En lugar de repetir el JOIN completo por login, se consulta una firma
+        barata (COUNT + MAX(registration_date)) como máximo cada BIO_CACHE_TTL
+        segundos y solo se reconstruye la matriz cuando la firma cambia.
+        """
+        now = time.monotonic()
+
+        if self._bio_matrix is not None and (now - self._bio_cache_ts) < self.BIO_CACHE_TTL:
+            return
+
+        with self._cursor() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*), MAX(registration_date) FROM user_biometrics WHERE is_active = TRUE
+            """)
+            signature = cursor.fetchone()
+
+        self._bio_cache_ts = now
+
+        if self._bio_matrix is None or signature != self._bio_signature:
+            self._refresh_bio_cache()
+            self._bio_signature = signature
+
+    def authenticate_biometric(self, face_encoding: list, threshold: float = 0.6, ip_address: str = None) -> dict:
+        """Autenticar usuario por biometría facial"""
+        try:
+            # Debug: Verificar el encoding recibido
+            logger.debug("Intentando autenticación biométrica")
+            logger.debug("Encoding recibido: %d dimensiones", len(face_encoding))
+            logger.debug("Umbral de confianza: %s", threshold)
+
+            # Validar frescura del cache SoA (firma barata + TTL)
+            self._ensure_bio_cache()
+
+            if self._bio_matrix.shape[0] == 0:
+                logger.debug("No hay usuarios con biometría registrada y activa")
                 return {"success": False, "error": "No hay usuarios con biometría registrada"}
-            
-            # Debug: Mostrar usuarios encontrados
-            for user in biometric_users:
-                print(f"🔍 DEBUG: Usuario {user['username']} - biometric_enabled: {user['biometric_enabled']}, face_registered: {user['face_registered']}")
-            
-            # Comparar con cada encoding registrado
-            import numpy as np
-            
-            best_match = None
-            best_distance = float('inf')
-            
-            for bio_user in biometric_users:
-                stored_encoding = json.loads(bio_user['face_encoding'])
-                print(f"🔍 DEBUG: Comparando con {bio_user['username']} (encoding: {len(stored_encoding)} dim)")
-                
-                distance = np.linalg.norm(np.array(face_encoding) - np.array(stored_encoding))
-                print(f"🔍 DEBUG: Distancia calculada: {distance:.4f}")
-                
-                if distance < best_distance:
-                    best_distance = distance
-                    best_match = bio_user
-                    print(f"🔍 DEBUG: Nuevo mejor match: {bio_user['username']} (distancia: {distance:.4f})")
-            
-            print(f"🔍 DEBUG: Mejor match final: {best_match['username'] if best_match else 'None'}")
-            print(f"🔍 DEBUG: Distancia final: {best_distance:.4f}, Umbral: {threshold}")
-            
-            # Verificar si está dentro del umbral
-            if best_match and best_distance < threshold:
-                print(f"✅ DEBUG: Autenticación exitosa para {best_match['username']}")
+
+            probe = np.asarray(face_encoding, dtype=np.float32)
+
+            if self._bio_proj is not None:
+                # Prefiltro grueso en 16 dimensiones y refinado exacto del top-K
+                probe16 = (probe - self._bio_mean) @ self._bio_proj
+                diffs16 = self._bio_matrix16 - probe16
+                d2_coarse = np.einsum('ij,ij->i', diffs16, diffs16)
+                top = np.argpartition(d2_coarse, self.BIO_PCA_TOP_K)[:self.BIO_PCA_TOP_K]
+                sub_idx, best_d2 = nearest_l2(np.ascontiguousarray(self._bio_matrix[top]), probe)
+                idx = int(top[sub_idx])
+            else:
+                # Distancias contra todos los usuarios en una sola pasada del kernel
+                idx, best_d2 = nearest_l2(self._bio_matrix, probe)
+            best_match = self._bio_meta[idx]
+
+            logger.debug("Mejor match final: %s", best_match['username'])
+
+            # Comparar en distancia al cuadrado (monótona respecto a la L2):
+            # el sqrt se hace una sola vez y solo para la confianza reportada
+            if best_d2 < threshold * threshold:
+                best_distance = math.sqrt(best_d2)
+                logger.debug("Distancia final: %.4f, Umbral: %s", best_distance, threshold)
+                logger.debug("Autenticación exitosa para %s", best_match['username'])
                 user_id = best_match['user_id']
-                
+
                 # Actualizar estadísticas
-                cursor.execute("""
-                    UPDATE user_biometrics 
-                    SET last_verification = CURRENT_TIMESTAMP, verification_count = verification_count + 1
-                    WHERE user_id = %s
-                """, (user_id,))
-                
-                self.update_last_login(user_id)
-                self.log_auth_attempt(user_id, best_match['email'], 'biometric', 'success', ip_address=ip_address)
-                
+                with self._cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE user_biometrics
+                        SET last_verification = CURRENT_TIMESTAMP, verification_count = verification_count + 1
+                        WHERE user_id = %s
+                    """, (user_id,))
+
+                self._finalize_auth_success(user_id, best_match['email'], 'biometric', ip_address)
+
                 return {
                     "success": True,
                     "user": {
@@ -441,119 +673,190 @@ class DualAuthDatabase:
                     "confidence": 1.0 - (best_distance / threshold)
                 }
             else:
-                print(f"❌ DEBUG: Autenticación rechazada - distancia {best_distance:.4f} > umbral {threshold}")
+                logger.debug("Autenticación rechazada - distancia %.4f > umbral %s",
+                             math.sqrt(best_d2), threshold)
                 self.log_auth_attempt(None, None, 'biometric', 'failed', 'No biometric match', ip_address=ip_address)
                 return {"success": False, "error": "No se pudo verificar la identidad biométrica"}
-            
+
         except Exception as e:
-            print(f"❌ DEBUG: Error en authenticate_biometric: {e}")
+            logger.error("Error en authenticate_biometric: %s", e)
             return {"success": False, "error": f"Error en autenticación biométrica: {e}"}
-        finally:
-            if cursor:
-                cursor.close()
-    
+
+    def _finalize_auth_success(self, user_id: str, email: str, method: str, ip_address: str = None):
+        """Aplicar los efectos de un login exitoso sobre una misma conexión
+        del pool: resetear intentos, actualizar último login y registrar el
+        log. Dos execute() simples: el argumento multi= de connector 8.x
+        desapareció en 9.x y el round trip ahorrado no justifica atarse a
+        una versión."""
+        try:
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET login_attempts = 0, locked_until = NULL,
+                           last_login = CURRENT_TIMESTAMP WHERE id = %s
+                """, (user_id,))
+                cursor.execute("""
+                    INSERT INTO auth_logs (user_id, email, auth_method, status, ip_address)
+                    VALUES (%s, %s, %s, 'success', %s)
+                """, (user_id, email, method, ip_address))
+        except Error as e:
+            print(f"Error finalizing auth success: {e}")
+
+    def create_session(self, user_id: str, auth_method: str, duration_hours: int = 8,
+                       ip_address: str = None, user_agent: str = None) -> dict:
+        """Crear una sesión para un usuario autenticado.
+
+        El token viene de secrets.token_bytes (CSPRNG del sistema operativo)
+        y se guarda tal cual en BINARY(32); al cliente se le entrega la forma
+        urlsafe en base64 para que viaje como texto.
+        """
+        try:
+            sid = secrets.token_bytes(32)
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO user_sessions (session_id, user_id, auth_method,
+                                               expires_at, ip_address, user_agent)
+                    VALUES (%s, %s, %s, DATE_ADD(NOW(), INTERVAL %s HOUR), %s, %s)
+                """, (sid, user_id, auth_method, duration_hours, ip_address, user_agent))
+            return {"success": True,
+                    "session_token": base64.urlsafe_b64encode(sid).decode('ascii')}
+        except Error as e:
+            print(f"Error creando sesión: {e}")
+            return {"success": False, "error": f"Error creando sesión: {e}"}
+
+    def validate_session(self, session_token: str) -> dict:
+        """Validar un token de sesión y retornar el usuario asociado"""
+        try:
+            sid = base64.urlsafe_b64decode(session_token.encode('ascii'))
+        except (ValueError, AttributeError):
+            return {"success": False, "error": "Token de sesión inválido"}
+        try:
+            with self._cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT s.user_id, s.auth_method, u.email, u.username
+                    FROM user_sessions s
+                    JOIN users u ON u.id = s.user_id
+                    WHERE s.session_id = %s AND s.is_active = TRUE
+                          AND s.expires_at > NOW()
+                """, (sid,))
+                row = cursor.fetchone()
+            if not row:
+                return {"success": False, "error": "Sesión expirada o inválida"}
+            return {"success": True, "session": row}
+        except Error as e:
+            return {"success": False, "error": f"Error validando sesión: {e}"}
+
     def log_auth_attempt(self, user_id: str, email: str, method: str, status: str, reason: str = None, ip_address: str = None):
-        """Registrar intento de autenticación"""
+        """Encolar intento de autenticación (se inserta en lotes en segundo plano)"""
         try:
-            if not self.connection:
-                return
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                INSERT INTO auth_logs (user_id, email, auth_method, status, failure_reason, ip_address)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (user_id, email, method, status, reason, ip_address))
+            self._log_q.put_nowait((user_id, email, method, status, reason, ip_address))
+        except queue.Full:
+            print("Error logging auth attempt: cola de logs llena")
+
+    def _flush_log_batch(self, batch):
+        """Insertar un lote de logs en una sola sentencia multi-fila"""
+        try:
+            with self._cursor() as cursor:
+                cursor.executemany("""
+                    INSERT INTO auth_logs (user_id, email, auth_method, status, failure_reason, ip_address)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, batch)
         except Error as e:
-            print(f"Error logging auth attempt: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-    
+            print(f"Error logging auth attempts: {e}")
+
+    def _log_flush_loop(self):
+        """Hilo de fondo: drenar la cola de logs en lotes"""
+        while not self._log_stop.is_set():
+            try:
+                batch = [self._log_q.get(timeout=self.LOG_FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.LOG_FLUSH_BATCH:
+                try:
+                    batch.append(self._log_q.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush_log_batch(batch)
+
     def increment_login_attempts(self, user_id: str):
         """Incrementar intentos de login fallidos"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                UPDATE users SET login_attempts = login_attempts + 1
-                WHERE id = %s
-            """, (user_id,))
-            
-            # Bloquear si supera 5 intentos
-            cursor.execute("""
-                UPDATE users SET locked_until = DATE_ADD(NOW(), INTERVAL 15 MINUTE)
-                WHERE id = %s AND login_attempts >= 5
-            """, (user_id,))
-            
+            with self._cursor(prepared=True) as cursor:
+                # Incrementar y bloquear (si supera 5 intentos) en un solo UPDATE
+                cursor.execute("""
+                    UPDATE users
+                    SET login_attempts = login_attempts + 1,
+                        locked_until = IF(login_attempts + 1 >= 5,
+                                          DATE_ADD(NOW(), INTERVAL 15 MINUTE),
+                                          locked_until)
+                    WHERE id = %s
+                """, (user_id,))
         except Error as e:
             print(f"Error incrementing login attempts: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def reset_login_attempts(self, user_id: str):
         """Resetear intentos de login"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                UPDATE users SET login_attempts = 0, locked_until = NULL
-                WHERE id = %s
-            """, (user_id,))
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET login_attempts = 0, locked_until = NULL
+                    WHERE id = %s
+                """, (user_id,))
         except Error as e:
             print(f"Error resetting login attempts: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def update_last_login(self, user_id: str):
         """Actualizar último login"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                UPDATE users SET last_login = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (user_id,))
+            with self._cursor() as cursor:
+                cursor.execute("""
+                    UPDATE users SET last_login = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                """, (user_id,))
         except Error as e:
             print(f"Error updating last login: {e}")
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def get_user_profile(self, user_id: str) -> dict:
         """Obtener perfil completo del usuario"""
         try:
-            if not self.connection:
-                self.connect()
-            
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute("""
-                SELECT u.*, 
-                       CASE WHEN b.id IS NOT NULL THEN TRUE ELSE FALSE END as has_biometric
-                FROM users u
-                LEFT JOIN user_biometrics b ON u.id = b.user_id AND b.is_active = TRUE
-                WHERE u.id = %s
-            """, (user_id,))
-            
-            return cursor.fetchone()
-            
+            with self._cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT u.*,
+                           CASE WHEN b.id IS NOT NULL THEN TRUE ELSE FALSE END as has_biometric
+                    FROM users u
+                    LEFT JOIN user_biometrics b ON u.id = b.user_id AND b.is_active = TRUE
+                    WHERE u.id = %s
+                """, (user_id,))
+
+                return cursor.fetchone()
         except Error as e:
             return None
-        finally:
-            if cursor:
-                cursor.close()
-    
+
     def close(self):
-        """Cerrar conexión"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("✅ Conexión MySQL cerrada")
+        """Liberar el pool de conexiones y el pool de hilos de bcrypt"""
+        # Volcar los logs pendientes antes de cerrar
+        self._log_stop.set()
+        remainder = []
+        while True:
+            try:
+                remainder.append(self._log_q.get_nowait())
+            except queue.Empty:
+                break
+        if remainder:
+            self._flush_log_batch(remainder)
+
+        self._pw_pool.shutdown(wait=False)
+        if self._pool is not None:
+            self._pool = None
+            print("✅ Pool de conexiones MySQL liberado")
 
 if __name__ == "__main__":
     # Test de la base de datos
     db = DualAuthDatabase()
-    
+
     print("🔧 Inicializando sistema de autenticación dual...")
     if db.create_database_and_tables():
         print("✅ Sistema de base de datos listo")
     else:
         print("❌ Error inicializando base de datos")
-    
+
     db.close()
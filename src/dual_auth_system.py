@@ -6,10 +6,12 @@ Maneja tanto autenticación tradicional como biométrica
 
 import tkinter as tk
 from tkinter import ttk, messagebox, font
-import cv2
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 import numpy as np
-from PIL import Image, ImageTk
 import threading
+import time
+import queue
 import sys
 import os
 
@@ -20,21 +22,75 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'database'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from database.dual_auth_backend import DualAuthDatabase
-from face_encoder import RobustFaceEncoder
+from database._bio_kernel import znorm
+
+# cv2 y PIL (y con ellos el encoder facial) se importan perezosamente: un
+# login solo con contraseña no paga los cientos de ms que cuesta mapear las
+# bibliotecas nativas de OpenCV
+cv2 = None
+Image = None
+ImageTk = None
+
+
+def _load_vision():
+    """Importar cv2 y PIL la primera vez que se necesita la cámara"""
+    global cv2, Image, ImageTk
+    if cv2 is None:
+        import cv2 as _cv2
+        from PIL import Image as _Image, ImageTk as _ImageTk
+        cv2, Image, ImageTk = _cv2, _Image, _ImageTk
+
+
+def _open_camera(index=0):
+    """Abrir la cámara con backend explícito (evita los segundos de
+    auto-detección de CAP_ANY) y propiedades fijadas al crearla:
+    640x480 es ~5x menos datos por USB que la resolución nativa y
+    BUFFERSIZE=1 minimiza la latencia de frames encolados"""
+    if sys.platform.startswith('linux'):
+        camera = cv2.VideoCapture(index, cv2.CAP_V4L2)
+    elif sys.platform.startswith('win'):
+        camera = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+    else:
+        camera = cv2.VideoCapture(index)
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    camera.set(cv2.CAP_PROP_FPS, 30)
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return camera
 
 class DualAuthSystem:
     """Sistema principal de autenticación dual"""
     
+    # Segundos que se considera vigente la IP local cacheada
+    LOCAL_IP_TTL = 60.0
+
     def __init__(self):
         self.db = DualAuthDatabase()
-        self.face_encoder = RobustFaceEncoder()
+        self._face_encoder = None
         self.current_user = None
         self.camera = None
         self.camera_active = False
-        
+
+        # IP local cacheada (cambia rara vez; evita un socket UDP por login)
+        self._cached_ip = None
+        self._cached_ip_ts = 0.0
+
+        # Pool de hilos compartido para login/registro/verificación: evita
+        # crear y destruir un pthread por clic y acota la concurrencia a BD
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
         # Inicializar base de datos
         self.db.create_database_and_tables()
-    
+
+    @property
+    def face_encoder(self):
+        """Encoder facial, creado perezosamente (su import arrastra cv2)"""
+        if self._face_encoder is None:
+            _load_vision()
+            from face_encoder import RobustFaceEncoder
+            self._face_encoder = RobustFaceEncoder()
+        return self._face_encoder
+
     def start_login_interface(self):
         """Iniciar interfaz de login"""
         self.login_window = LoginWindow(self)
@@ -55,15 +111,20 @@ class DualAuthSystem:
         ip_address = self.get_local_ip()
         return self.db.register_user(**user_data, ip_address=ip_address)
     def get_local_ip(self):
-        """Obtener la IP local de la máquina"""
+        """Obtener la IP local de la máquina (cacheada con TTL)"""
+        now = time.monotonic()
+        if self._cached_ip is not None and now - self._cached_ip_ts < self.LOCAL_IP_TTL:
+            return self._cached_ip
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             s.connect(("8.8.8.8", 80))
             ip = s.getsockname()[0]
             s.close()
-            return ip
         except Exception:
-            return "127.0.0.1"
+            ip = "127.0.0.1"
+        self._cached_ip = ip
+        self._cached_ip_ts = now
+        return ip
     
     def register_face_biometric(self, user_id: str, face_encoding: list) -> dict:
         """Registrar biometría facial"""
@@ -88,6 +149,11 @@ class DualAuthSystem:
         except Exception as e:
             print(f"❌ DEBUG: Error actualizando estado del usuario: {e}")
     
+    def cleanup(self):
+        """Liberar recursos al salir de la aplicación"""
+        self.executor.shutdown(wait=False)
+        self.db.close()
+
     def start_main_application(self, user: dict):
         """Iniciar aplicación principal después del login"""
         self.current_user = user
@@ -103,7 +169,14 @@ class DualAuthSystem:
 
 class LoginWindow:
     """Ventana de login con opciones duales"""
-    
+
+    # Cada cuántos frames de detección se re-escanea el frame completo
+    # (entre medio solo se busca alrededor del último rostro)
+    FULL_RESCAN_EVERY = 15
+
+    # Cada cuántos frames del preview se ejecuta la detección Haar
+    DETECT_EVERY = 3
+
     def __init__(self, auth_system: DualAuthSystem):
         self.auth_system = auth_system
         self.setup_ui()
@@ -119,12 +192,17 @@ class LoginWindow:
     
     def on_closing(self):
         """Manejar cierre de ventana"""
+        self._alive = False
         self.cleanup()
+        self.auth_system.cleanup()
         self.root.quit()
         self.root.destroy()
         
     def setup_ui(self):
         """Configurar interfaz de usuario"""
+        # Bandera barata de vida de la ventana: evita round-trips
+        # winfo_exists() por frame en los callbacks del preview
+        self._alive = True
         self.root = tk.Tk()
         self.root.title("Sistema de Autenticación Dual")
         self.root.geometry("1000x800")  # Más grande para asegurar que todo sea visible
@@ -144,7 +222,7 @@ class LoginWindow:
         title_label = ttk.Label(
             main_frame, 
             text="🔐 Sistema de Autenticación", 
-            font=('Arial', 24, 'bold'),
+            font=self.f_title,
             foreground='#2c3e50'
         )
         title_label.pack(pady=(0, 30))
@@ -169,7 +247,7 @@ class LoginWindow:
         self.status_label = ttk.Label(
             self.status_frame, 
             text="Selecciona un método de autenticación",
-            font=('Arial', 10),
+            font=self.f_small,
             foreground='#7f8c8d'
         )
         self.status_label.pack()
@@ -178,13 +256,24 @@ class LoginWindow:
         """Configurar estilos personalizados"""
         style = ttk.Style()
         style.theme_use('clam')
-        
+
+        # Fuentes nombradas: Tk resuelve el descriptor una sola vez en lugar
+        # de re-parsear la tupla ('Arial', N, ...) por cada widget creado
+        self.f_title = font.Font(family='Arial', size=24, weight='bold')
+        self.f_heading = font.Font(family='Arial', size=16, weight='bold')
+        self.f_subtitle = font.Font(family='Arial', size=14, weight='bold')
+        self.f_entry = font.Font(family='Arial', size=12)
+        self.f_body = font.Font(family='Arial', size=11)
+        self.f_body_bold = font.Font(family='Arial', size=11, weight='bold')
+        self.f_small = font.Font(family='Arial', size=10)
+        self.f_tiny = font.Font(family='Arial', size=9)
+
         # Configurar colores
-        style.configure('Custom.TLabel', font=('Arial', 11))
-        style.configure('Title.TLabel', font=('Arial', 14, 'bold'))
+        style.configure('Custom.TLabel', font=self.f_body)
+        style.configure('Title.TLabel', font=self.f_subtitle)
         style.configure('Success.TLabel', foreground='#27ae60')
         style.configure('Error.TLabel', foreground='#e74c3c')
-        style.configure('Accent.TButton', font=('Arial', 11, 'bold'))
+        style.configure('Accent.TButton', font=self.f_body_bold)
     
     def create_password_tab(self):
         """Crear tab de autenticación por contraseña"""
@@ -204,12 +293,12 @@ class LoginWindow:
         
         # Email
         ttk.Label(form_frame, text="Email:", style='Custom.TLabel').pack(anchor=tk.W, pady=(0, 5))
-        self.email_entry = ttk.Entry(form_frame, font=('Arial', 12), width=40)
+        self.email_entry = ttk.Entry(form_frame, font=self.f_entry, width=40)
         self.email_entry.pack(fill=tk.X, pady=(0, 15))
         
         # Contraseña
         ttk.Label(form_frame, text="Contraseña:", style='Custom.TLabel').pack(anchor=tk.W, pady=(0, 5))
-        self.password_entry = ttk.Entry(form_frame, font=('Arial', 12), width=40, show='*')
+        self.password_entry = ttk.Entry(form_frame, font=self.f_entry, width=40, show='*')
         self.password_entry.pack(fill=tk.X, pady=(0, 20))
         
         # Botón de login
@@ -233,14 +322,14 @@ class LoginWindow:
         ttk.Label(
             biometric_frame, 
             text="Autenticación Biométrica",
-            font=('Arial', 16, 'bold')
+            font=self.f_heading
         ).pack(pady=(0, 10))
         
         # Instrucciones
         self.biometric_instructions = ttk.Label(
             biometric_frame,
             text="Activa la cámara y verifica tu identidad mediante reconocimiento facial",
-            font=('Arial', 11),
+            font=self.f_body,
             foreground='#7f8c8d'
         )
         self.biometric_instructions.pack(pady=(0, 10))
@@ -256,7 +345,7 @@ class LoginWindow:
         self.camera_label = ttk.Label(
             self.camera_frame, 
             text="📹 Cámara desactivada\n\nPresiona 'Activar Cámara' para comenzar",
-            font=('Arial', 10),  # Reducir tamaño de fuente
+            font=self.f_small,  # Reducir tamaño de fuente
             width=45,  # Reducir ancho
             anchor='center',
             background='#f8f9fa'
@@ -267,7 +356,7 @@ class LoginWindow:
         self.face_status_label = ttk.Label(
             biometric_frame,
             text="⚪ Esperando activación de cámara...",
-            font=('Arial', 11, 'bold'),
+            font=self.f_body_bold,
             foreground='#7f8c8d'
         )
         self.face_status_label.pack(pady=5)
@@ -321,7 +410,7 @@ class LoginWindow:
         self.biometric_status_label = ttk.Label(
             biometric_frame,
             text="",
-            font=('Arial', 10),
+            font=self.f_small,
             foreground='#3498db'
         )
         self.biometric_status_label.pack(pady=5)  # Reducir espacio
@@ -330,7 +419,7 @@ class LoginWindow:
         help_label = ttk.Label(
             biometric_frame,
             text="💡 Tip: Puedes detener la cámara en cualquier momento usando el botón 'Detener Cámara'",
-            font=('Arial', 9),
+            font=self.f_tiny,
             foreground='#95a5a6'
         )
         help_label.pack(pady=2)  # Reducir espacio
@@ -338,7 +427,38 @@ class LoginWindow:
         # Variables para detección facial
         self.detecting_face = False
         self.face_detected = False
-    
+        # Seguimiento: última caja detectada (en coords del gris reducido)
+        # y contador de frames para el re-escaneo completo periódico
+        self._last_face_box = None
+        self._det_frame_count = 0
+        # Decimación: Haar corre solo 1 de cada DETECT_EVERY frames del
+        # preview; entre medio se redibuja la última caja
+        self._det_counter = 0
+        self._last_faces = []
+        # PhotoImage persistente del preview: se pega cada frame encima en
+        # lugar de crear (y dejar al GC) una textura Tk nueva por frame
+        self._tk_img = None
+        # Slot de "último frame": el hilo capturador escribe el más reciente
+        # y el loop de Tk solo consume, sin bloquearse en el driver
+        self._frame_slot = None
+        self._frame_lock = threading.Lock()
+        self._grab_thread = None
+        # Cola de 1 frame hacia el hilo conversor (resize/detección/RGB
+        # corren ahí; al hilo de Tk solo llega el blit final)
+        self._conv_queue = queue.Queue(maxsize=1)
+        self._conv_thread = None
+        # Buffers de destino reutilizables del preview (resize/cvtColor
+        # escriben en ellos con dst= en vez de alocar un ndarray por frame)
+        self._buf_small = None
+        self._buf_gray = None
+        self._buf_rgb = None
+        # Última caja del rostro detectado, en coords del preview 400x300
+        # (al verificar identidad se re-escala al frame completo y se
+        # encodea solo ese ROI, sin re-detectar)
+        self._last_face_box_preview = None
+        # Cache del texto de estado para no llamar a Tcl en cada frame
+        self._last_face_status = None
+
     def create_register_tab(self):
         """Crear tab de registro"""
         register_frame = ttk.Frame(self.notebook, padding="20")
@@ -378,7 +498,7 @@ class LoginWindow:
             
             ttk.Label(field_frame, text=label_text, style='Custom.TLabel').pack(anchor=tk.W)
             
-            entry = ttk.Entry(field_frame, font=('Arial', 11), width=50)
+            entry = ttk.Entry(field_frame, font=self.f_body, width=50)
             if 'password' in field_name:
                 entry.configure(show='*')
                 
@@ -409,8 +529,8 @@ class LoginWindow:
         
         self.show_status("Verificando credenciales...", "info")
         
-        # Autenticar en hilo separado
-        threading.Thread(target=self._authenticate_password, args=(email, password)).start()
+        # Autenticar en el pool de hilos compartido
+        self.auth_system.executor.submit(self._authenticate_password, email, password)
     
     def _authenticate_password(self, email: str, password: str):
         """Autenticar contraseña en hilo separado"""
@@ -452,8 +572,8 @@ class LoginWindow:
         
         self.show_status("Creando cuenta...", "info")
         
-        # Registrar en hilo separado
-        threading.Thread(target=self._register_user, args=(register_data,)).start()
+        # Registrar en el pool de hilos compartido
+        self.auth_system.executor.submit(self._register_user, register_data)
     
     def _register_user(self, user_data: dict):
         """Registrar usuario en hilo separado"""
@@ -486,17 +606,38 @@ class LoginWindow:
     def start_camera(self):
         """Iniciar cámara para login biométrico"""
         try:
-            self.auth_system.camera = cv2.VideoCapture(0)
+            _load_vision()
+            self.auth_system.camera = _open_camera()
             if not self.auth_system.camera.isOpened():
-                self.face_status_label.configure(text="❌ Error: No se pudo acceder a la cámara", foreground='#e74c3c')
+                self._set_face_status("❌ Error: No se pudo acceder a la cámara", '#e74c3c')
                 self.biometric_status_label.configure(text="Verifica que tu cámara esté conectada y no esté siendo usada por otra aplicación")
                 return
-            
+
             self.auth_system.camera_active = True
+
+            # Hilo capturador: VideoCapture.read() bloquea y no debe correr
+            # en el hilo de Tk
+            self._grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+            self._grab_thread.start()
+
+            # Hilo conversor: todo el trabajo pesado por frame corre aquí
+            self._conv_thread = threading.Thread(target=self._convert_loop, daemon=True)
+            self._conv_thread.start()
+
+            # Buffers de píxeles reutilizables del preview
+            if self._buf_small is None:
+                self._buf_small = np.empty((300, 400, 3), np.uint8)
+                self._buf_gray = np.empty((300, 400), np.uint8)
+                self._buf_rgb = np.empty((300, 400, 3), np.uint8)
+
+            # Buffer Tk único para todo el preview
+            if self._tk_img is None:
+                self._tk_img = ImageTk.PhotoImage(Image.new('RGB', (400, 300)))
+            self.camera_label.configure(image=self._tk_img, text='')
+
             self.update_camera_controls(True)
-            self.update_camera_feed()
             
-            self.face_status_label.configure(text="📹 Cámara activada - Posiciónate frente a la cámara", foreground='#27ae60')
+            self._set_face_status("📹 Cámara activada - Posiciónate frente a la cámara", '#27ae60')
             self.biometric_status_label.configure(text="Cámara lista. Presiona 'Verificar Identidad' cuando detectes tu rostro.")
             self.biometric_instructions.configure(
                 text="✅ Cámara activada. Asegúrate de estar bien iluminado y centrado.",
@@ -504,7 +645,7 @@ class LoginWindow:
             )
             
         except Exception as e:
-            self.face_status_label.configure(text=f"❌ Error iniciando cámara: {e}", foreground='#e74c3c')
+            self._set_face_status(f"❌ Error iniciando cámara: {e}", '#e74c3c')
             self.biometric_status_label.configure(text="Hubo un problema al acceder a la cámara")
     
     def stop_camera(self):
@@ -512,7 +653,17 @@ class LoginWindow:
         self.auth_system.camera_active = False
         self.detecting_face = False
         self.face_detected = False
-        
+
+        # Esperar a que capturador y conversor terminen antes de liberar
+        if self._grab_thread is not None:
+            self._grab_thread.join(timeout=0.5)
+            self._grab_thread = None
+        if self._conv_thread is not None:
+            self._conv_thread.join(timeout=0.5)
+            self._conv_thread = None
+        self._frame_slot = None
+        self._last_face_box_preview = None
+
         if self.auth_system.camera:
             self.auth_system.camera.release()
         
@@ -521,7 +672,7 @@ class LoginWindow:
             text="📹 Cámara desactivada\n\nPresiona 'Activar Cámara' para comenzar",
             background='#f8f9fa'
         )
-        self.face_status_label.configure(text="⚪ Esperando activación de cámara...", foreground='#7f8c8d')
+        self._set_face_status("⚪ Esperando activación de cámara...", '#7f8c8d')
         self.biometric_status_label.configure(text="")
         self.biometric_instructions.configure(
             text="Activa la cámara y verifica tu identidad mediante reconocimiento facial",
@@ -544,102 +695,200 @@ class LoginWindow:
             self.start_camera_btn.configure(state=tk.NORMAL)
             self.biometric_login_btn.configure(state=tk.DISABLED)
             self.stop_camera_btn.configure(state=tk.DISABLED)
-    
-    def update_camera_feed(self):
-        """Actualizar feed de la cámara con detección facial en tiempo real"""
-        # Verificar que la ventana y componentes existan
-        if not hasattr(self, 'root') or not self.root.winfo_exists():
-            return
-        
-        if not hasattr(self, 'camera_label') or not self.camera_label.winfo_exists():
-            return
-            
-        if not self.auth_system.camera_active or not self.auth_system.camera:
-            return
-        
-        ret, frame = self.auth_system.camera.read()
-        if ret:
-            # Redimensionar frame
-            frame = cv2.resize(frame, (400, 300))
-            display_frame = frame.copy()
-            
-            # Detectar rostros en tiempo real
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _set_face_status(self, text, color):
+        """Actualizar el label de estado solo si el texto cambió (cada
+        configure es una llamada al intérprete Tcl)"""
+        if text != self._last_face_status:
+            self._last_face_status = text
+            self.face_status_label.configure(text=text, foreground=color)
+
+    def _grab_loop(self):
+        """Capturar frames en segundo plano dejando solo el más reciente en
+        el slot (los frames viejos se descartan, reduciendo latencia)"""
+        camera = self.auth_system.camera
+        while self.auth_system.camera_active:
+            ret, frame = camera.read()
+            if ret:
+                with self._frame_lock:
+                    self._frame_slot = frame
+                # Publicar al conversor descartando el frame viejo si aún
+                # no fue consumido
+                try:
+                    self._conv_queue.put_nowait(frame)
+                except queue.Full:
+                    try:
+                        self._conv_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    try:
+                        self._conv_queue.put_nowait(frame)
+                    except queue.Full:
+                        pass
+
+    def _latest_frame(self):
+        """Consumir el frame más reciente del slot (None si no hay nuevo)"""
+        with self._frame_lock:
+            frame = self._frame_slot
+            self._frame_slot = None
+        return frame
+
+    def _detect_faces(self, gray):
+        """Detectar rostros sobre un gris a mitad de resolución (4x menos
+        píxeles para las etapas Haar). Entre re-escaneos completos solo se
+        busca en un recorte con margen alrededor del último rostro; las
+        coordenadas se devuelven re-escaladas al frame de 400x300.
+
+        Los parámetros asumen el caso selfie centrado del login (rostro de
+        80-250 px en el frame de 400x300, o sea 40-125 en el gris reducido):
+        con scaleFactor=1.25 y ese rango de tamaños la pirámide Haar evalúa
+        la mitad de niveles que la búsqueda genérica. El camino de
+        enrolamiento/autenticación conserva su búsqueda exhaustiva propia."""
+        cascade = self.auth_system.face_encoder.face_cascade
+        small = cv2.resize(gray, (200, 150))
+        self._det_frame_count += 1
+
+        if (self._last_face_box is not None and
+                self._det_frame_count % self.FULL_RESCAN_EVERY != 0):
+            # Búsqueda local alrededor de la última caja
+            x, y, w, h = self._last_face_box
+            pad = w // 2
+            x0, y0 = max(x - pad, 0), max(y - pad, 0)
+            x1, y1 = min(x + w + pad, 200), min(y + h + pad, 150)
+            found = cascade.detectMultiScale(
+                small[y0:y1, x0:x1], scaleFactor=1.25, minNeighbors=4,
+                minSize=(40, 40), maxSize=(140, 140)
+            )
+            if len(found) > 0:
+                fx, fy, fw, fh = found[0]
+                self._last_face_box = (x0 + fx, y0 + fy, fw, fh)
+            else:
+                self._last_face_box = None
+        else:
+            # Re-escaneo completo periódico (o sin caja previa)
+            found = cascade.detectMultiScale(
+                small, scaleFactor=1.25, minNeighbors=4,
+                minSize=(40, 40), maxSize=(140, 140)
+            )
+            self._last_face_box = tuple(found[0]) if len(found) > 0 else None
+
+        if self._last_face_box is None:
+            return []
+        x, y, w, h = self._last_face_box
+        return [(x * 2, y * 2, w * 2, h * 2)]
+
+    def _convert_loop(self):
+        """Consumir frames del capturador y procesarlos (resize, detección,
+        overlays, conversión RGB) fuera del hilo de Tk; el hilo principal
+        solo recibe el blit final vía after(0, ...)"""
+        while self.auth_system.camera_active:
             try:
-                faces = self.auth_system.face_encoder.face_cascade.detectMultiScale(
-                    gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30), maxSize=(300, 300)
-                )
+                frame = self._conv_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                pil_img, faces = self._process_frame(frame)
+            except cv2.error as e:
+                print(f"⚠️ DEBUG: Error procesando frame: {e}")
+                continue
+            try:
+                self.root.after(0, self._apply_photo, pil_img, faces)
+            except (tk.TclError, RuntimeError):
+                # La ventana fue cerrada, detener la actualización
+                break
+
+    def _process_frame(self, frame):
+        """Pipeline por frame (corre en el hilo conversor): redimensionar,
+        detectar, dibujar overlays y devolver la imagen PIL lista para Tk"""
+        # Redimensionar al buffer reutilizable; se dibuja directo sobre
+        # él (se vuelve a escribir completo en el siguiente frame).
+        # INTER_NEAREST basta para el preview (la autenticación usa el
+        # recorte del frame capturado, no este downsample)
+        frame = cv2.resize(frame, (400, 300), dst=self._buf_small,
+                           interpolation=cv2.INTER_NEAREST)
+        display_frame = frame
+
+        # Detectar rostros solo cada DETECT_EVERY frames; el preview
+        # sigue a 30 fps pero la detección queda acotada a ~10 Hz
+        self._det_counter += 1
+        if self._det_counter % self.DETECT_EVERY == 0:
+            try:
+                # Detector DNN si el modelo está disponible; si no, Haar
+                # sobre el gris reducido
+                encoder = self.auth_system.face_encoder
+                if encoder.face_net is not None:
+                    faces = encoder.detect_faces_dnn(frame)
+                else:
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._buf_gray)
+                    faces = self._detect_faces(gray)
             except cv2.error as e:
                 print(f"⚠️ DEBUG: Error en detección facial: {e}")
                 faces = []
-            
-            # Dibujar bounding boxes y actualizar estado
-            if len(faces) > 0:
-                self.face_detected = True
-                # Habilitar botón de verificar solo si no estamos verificando
-                if not self.detecting_face:
-                    self.biometric_login_btn.configure(state=tk.NORMAL)
-                    
-                for (x, y, w, h) in faces:
-                    # Color del cuadro según el estado
-                    if self.detecting_face:
-                        color = (255, 165, 0)  # Naranja durante verificación
-                        thickness = 3
-                        self.face_status_label.configure(
-                            text="🔍 Verificando rostro...",
-                            foreground='#f39c12'
-                        )
-                    else:
-                        color = (0, 255, 0)  # Verde cuando detecta rostro
-                        thickness = 2
-                        self.face_status_label.configure(
-                            text="✅ Rostro detectado",
-                            foreground='#27ae60'
-                        )
-                    
-                    # Dibujar rectángulo alrededor del rostro
-                    cv2.rectangle(display_frame, (x, y), (x+w, y+h), color, thickness)
-                    
-                    # Añadir texto encima del cuadro
-                    cv2.putText(display_frame, "Rostro", (x, y-10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            self._last_faces = faces
+        else:
+            faces = self._last_faces
+
+        if len(faces) > 0:
+            # Guardar la caja para que la verificación recorte el frame
+            # a resolución completa (los píxeles del preview son INTER_NEAREST)
+            self._last_face_box_preview = faces[0]
+
+            # Color del cuadro según el estado
+            if self.detecting_face:
+                color = (255, 165, 0)  # Naranja durante verificación
+                thickness = 3
             else:
-                self.face_detected = False
-                # Deshabilitar botón de verificar cuando no hay rostro
-                if not self.detecting_face:
-                    self.biometric_login_btn.configure(state=tk.DISABLED)
-                    self.face_status_label.configure(
-                        text="👤 Posiciónate frente a la cámara",
-                        foreground='#7f8c8d'
-                    )
-            
-            # Convertir a RGB para mostrar
-            frame_rgb = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-            
-            # Convertir a ImageTk
-            image = Image.fromarray(frame_rgb)
-            photo = ImageTk.PhotoImage(image)
-            
-            self.camera_label.configure(image=photo, text='')
-            self.camera_label.image = photo
-        
-        # Programar siguiente actualización
-        if self.auth_system.camera_active and hasattr(self, 'root') and self.root.winfo_exists():
-            try:
-                self.root.after(30, self.update_camera_feed)
-            except tk.TclError:
-                # La ventana fue cerrada, detener la actualización
-                pass
-    
+                color = (0, 255, 0)  # Verde cuando detecta rostro
+                thickness = 2
+
+            # Todos los rectángulos en una sola llamada de dibujo
+            boxes = np.asarray(
+                [[[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+                 for (x, y, w, h) in faces], np.int32
+            )
+            cv2.polylines(display_frame, boxes, True, color, thickness)
+            for (x, y, w, h) in faces:
+                cv2.putText(display_frame, "Rostro", (x, y - 10),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        # Convertir a RGB; frombuffer copia los bytes, así que el buffer
+        # puede reutilizarse de inmediato
+        frame_rgb = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB, dst=self._buf_rgb)
+        pil_img = Image.frombuffer('RGB', (400, 300), frame_rgb.tobytes(), 'raw', 'RGB', 0, 1)
+        return pil_img, faces
+
+    def _apply_photo(self, pil_img, faces):
+        """Aplicar el frame ya procesado (único trabajo en el hilo de Tk):
+        pegar sobre el PhotoImage persistente y actualizar el estado"""
+        if not self._alive or not self.auth_system.camera_active:
+            return
+
+        self._tk_img.paste(pil_img)
+
+        if len(faces) > 0:
+            self.face_detected = True
+            if self.detecting_face:
+                self._set_face_status("🔍 Verificando rostro...", '#f39c12')
+            else:
+                # Habilitar botón de verificar solo si no estamos verificando
+                self.biometric_login_btn.configure(state=tk.NORMAL)
+                self._set_face_status("✅ Rostro detectado", '#27ae60')
+        else:
+            self.face_detected = False
+            # Deshabilitar botón de verificar cuando no hay rostro
+            if not self.detecting_face:
+                self.biometric_login_btn.configure(state=tk.DISABLED)
+                self._set_face_status("👤 Posiciónate frente a la cámara", '#7f8c8d')
+
     def handle_biometric_login(self):
         """Manejar login biométrico con retroalimentación visual mejorada"""
         if not self.auth_system.camera_active or not self.auth_system.camera:
-            self.face_status_label.configure(text="❌ Primero activa la cámara", foreground='#e74c3c')
+            self._set_face_status("❌ Primero activa la cámara", '#e74c3c')
             self.biometric_status_label.configure(text="Debes activar la cámara antes de verificar tu identidad")
             return
         
         if not self.face_detected:
-            self.face_status_label.configure(text="❌ No se detecta rostro válido", foreground='#e74c3c')
+            self._set_face_status("❌ No se detecta rostro válido", '#e74c3c')
             self.biometric_status_label.configure(text="Posiciónate frente a la cámara y asegúrate de que tu rostro esté visible")
             return
         
@@ -649,26 +898,51 @@ class LoginWindow:
         self.start_camera_btn.configure(state=tk.DISABLED)
         # Mantener stop_camera_btn activo para permitir cancelar la verificación
         
-        self.face_status_label.configure(text="🔍 Analizando rostro...", foreground='#f39c12')
+        self._set_face_status("🔍 Analizando rostro...", '#f39c12')
         self.biometric_status_label.configure(text="Mantente quieto mientras se analiza tu rostro")
         self.biometric_instructions.configure(
             text="🔍 Verificando identidad... No te muevas",
             foreground='#f39c12'
         )
         
-        # Capturar y procesar en hilo separado
-        threading.Thread(target=self._capture_and_authenticate, daemon=True).start()
+        # Capturar y procesar en el pool de hilos compartido
+        self.auth_system.executor.submit(self._capture_and_authenticate)
     
     def _capture_and_authenticate(self):
         """Capturar rostro y autenticar"""
         try:
-            ret, frame = self.auth_system.camera.read()
-            if not ret:
+            # Tomar el frame más reciente del capturador (reintentando
+            # brevemente si el slot ya fue consumido por el preview)
+            frame = None
+            for _ in range(10):
+                frame = self._latest_frame()
+                if frame is not None:
+                    break
+                time.sleep(0.05)
+            if frame is None:
                 self.root.after(0, self._reset_biometric_ui, "❌ Error capturando imagen", False)
                 return
             
-            # Procesar rostro
-            encoding = self.auth_system.face_encoder.encode_face_from_image(frame)
+            # Procesar rostro: si el preview ya localizó el rostro, re-escalar
+            # la caja al frame completo y encodear solo ese ROI a resolución
+            # nativa (igual que el enrolamiento; sin re-detectar)
+            encoding = None
+            box = self._last_face_box_preview
+            if box is not None:
+                x, y, w, h = box
+                # Las cajas vienen en coords del preview 400x300
+                sx = frame.shape[1] / 400.0
+                sy = frame.shape[0] / 300.0
+                x, w = int(x * sx), int(w * sx)
+                y, h = int(y * sy), int(h * sy)
+                pad = int(0.2 * w)
+                roi = frame[max(0, y - pad):y + h + pad,
+                            max(0, x - pad):x + w + pad]
+                if roi.size > 0:
+                    roi = cv2.resize(roi, (160, 160))
+                    encoding = self.auth_system.face_encoder.encode_face_from_aligned_crop(roi)
+            if encoding is None:
+                encoding = self.auth_system.face_encoder.encode_face_from_image(frame)
             
             if encoding is None:
                 self.root.after(0, self._reset_biometric_ui, "❌ No se detectó rostro válido", False)
@@ -703,7 +977,7 @@ class LoginWindow:
         
         # Actualizar mensajes
         color = '#27ae60' if success else '#e74c3c'
-        self.face_status_label.configure(text=message, foreground=color)
+        self._set_face_status(message, color)
         
         if not success:
             self.biometric_status_label.configure(text="Intenta de nuevo o verifica tu registro biométrico")
@@ -740,10 +1014,7 @@ class LoginWindow:
                 text=f"✅ ¡Bienvenido/a {display_name}!",
                 foreground='#27ae60'
             )
-            self.face_status_label.configure(
-                text="🎉 Acceso concedido",
-                foreground='#27ae60'
-            )
+            self._set_face_status("🎉 Acceso concedido", '#27ae60')
             self.show_status(f"✅ Autenticación exitosa - {user.get('username', 'Usuario')}", "success")
             
             # Cerrar cámara después de un breve retraso para mostrar el mensaje
@@ -755,10 +1026,7 @@ class LoginWindow:
                 text="❌ Usuario no reconocido o rostro no registrado",
                 foreground='#e74c3c'
             )
-            self.face_status_label.configure(
-                text="🚫 Biometría no registrada",
-                foreground='#e74c3c'
-            )
+            self._set_face_status("🚫 Biometría no registrada", '#e74c3c')
             self.show_status(f"❌ Acceso denegado: {result['error']}", "error")
             
             # Restaurar instrucciones después de unos segundos
@@ -776,7 +1044,7 @@ class LoginWindow:
             text="Posiciónate frente a la cámara para verificar tu identidad",
             foreground='#7f8c8d'
         )
-        self.face_status_label.configure(text="", foreground='#7f8c8d')
+        self._set_face_status("", '#7f8c8d')
     
     def show_status(self, message: str, status_type: str = "info"):
         """Mostrar mensaje de estado"""
@@ -805,6 +1073,7 @@ class MainApplication:
         self.root.title(f"Sistema Principal - {self.user['username']}")
         self.root.geometry("900x700")
         self.root.configure(bg='#ecf0f1')
+        self.setup_fonts()
         
         # Frame principal
         main_frame = ttk.Frame(self.root, padding="20")
@@ -817,7 +1086,7 @@ class MainApplication:
         ttk.Label(
             header_frame,
             text=f"🎉 Bienvenido, {self.user['username']}!",
-            font=('Arial', 20, 'bold'),
+            font=self.f_header,
             foreground='#2c3e50'
         ).pack(side=tk.LEFT)
         
@@ -828,9 +1097,10 @@ class MainApplication:
             command=self.logout
         ).pack(side=tk.RIGHT)
         
-        # Notebook para funciones
+        # Notebook para funciones (referencia cacheada para refrescos)
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill=tk.BOTH, expand=True)
+        self.notebook = notebook
         
         # Tab de perfil
         self.create_profile_tab(notebook)
@@ -838,9 +1108,21 @@ class MainApplication:
         # Tab de configuración biométrica
         self.create_biometric_setup_tab(notebook)
         
-        # Tab de historial
+        # Tab de historial: se crea vacío y se puebla recién cuando el
+        # usuario lo abre (la consulta a BD sale del camino post-login)
         self.create_history_tab(notebook)
+        notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
     
+    def setup_fonts(self):
+        """Crear fuentes nombradas una sola vez (Tk resuelve el descriptor
+        una vez en lugar de re-parsear la tupla por cada widget)"""
+        self.f_header = font.Font(family='Arial', size=20, weight='bold')
+        self.f_section = font.Font(family='Arial', size=16, weight='bold')
+        self.f_status = font.Font(family='Arial', size=12)
+        self.f_body = font.Font(family='Arial', size=11)
+        self.f_body_bold = font.Font(family='Arial', size=11, weight='bold')
+        self.f_small = font.Font(family='Arial', size=10)
+
     def create_profile_tab(self, notebook):
         """Crear tab de perfil de usuario"""
         profile_frame = ttk.Frame(notebook, padding="20")
@@ -849,7 +1131,7 @@ class MainApplication:
         ttk.Label(
             profile_frame,
             text="Información del Usuario",
-            font=('Arial', 16, 'bold')
+            font=self.f_section
         ).pack(pady=(0, 20))
         
         # Información del usuario
@@ -857,37 +1139,39 @@ class MainApplication:
         info_frame.pack(fill=tk.X, pady=10)
         
         # Construir información del usuario de forma dinámica
-        user_info = []
+        # (una sola referencia al dict en lugar de un lookup por campo)
+        user = self.user
+        first_name = user.get('first_name', '').strip()
+        last_name = user.get('last_name', '').strip()
+        
+        user_info = [
+            ("Email:", user.get('email', 'No disponible')),
+            ("Nombre de usuario:", user.get('username', 'No disponible')),
+            ("Biometría registrada:", "✅ Sí" if user.get('face_registered') else "❌ No")
+        ]
         
-        # Agregar nombre completo si está disponible
-        first_name = self.user.get('first_name', '').strip()
-        last_name = self.user.get('last_name', '').strip()
+        # Anteponer nombre completo si está disponible
         if first_name or last_name:
             full_name = f"{first_name} {last_name}".strip()
-            user_info.append(("Nombre completo:", full_name))
-        
-        user_info.extend([
-            ("Email:", self.user.get('email', 'No disponible')),
-            ("Nombre de usuario:", self.user.get('username', 'No disponible')),
-            ("Biometría registrada:", "✅ Sí" if self.user.get('face_registered') else "❌ No")
-        ])
+            user_info.insert(0, ("Nombre completo:", full_name))
         
         for label, value in user_info:
             row_frame = ttk.Frame(info_frame)
             row_frame.pack(fill=tk.X, pady=5)
             
-            ttk.Label(row_frame, text=label, font=('Arial', 11, 'bold')).pack(side=tk.LEFT)
-            ttk.Label(row_frame, text=value, font=('Arial', 11)).pack(side=tk.LEFT, padx=(10, 0))
+            ttk.Label(row_frame, text=label, font=self.f_body_bold).pack(side=tk.LEFT)
+            ttk.Label(row_frame, text=value, font=self.f_body).pack(side=tk.LEFT, padx=(10, 0))
     
     def create_biometric_setup_tab(self, notebook):
         """Crear tab de configuración biométrica"""
         bio_frame = ttk.Frame(notebook, padding="20")
         notebook.add(bio_frame, text="🔐 Configuración Biométrica")
+        self.bio_frame = bio_frame
         
         ttk.Label(
             bio_frame,
             text="Gestión de Autenticación Facial",
-            font=('Arial', 16, 'bold')
+            font=self.f_section
         ).pack(pady=(0, 20))
         
         if self.user.get('face_registered'):
@@ -895,7 +1179,7 @@ class MainApplication:
             ttk.Label(
                 bio_frame,
                 text="✅ Ya tienes configurada la autenticación facial",
-                font=('Arial', 12),
+                font=self.f_status,
                 foreground='#27ae60'
             ).pack(pady=10)
             
@@ -909,14 +1193,14 @@ class MainApplication:
             ttk.Label(
                 bio_frame,
                 text="⚠️ Aún no tienes configurada la autenticación facial",
-                font=('Arial', 12),
+                font=self.f_status,
                 foreground='#f39c12'
             ).pack(pady=10)
             
             ttk.Label(
                 bio_frame,
                 text="Registra tu rostro para habilitar el login biométrico en futuras sesiones:",
-                font=('Arial', 11)
+                font=self.f_body
             ).pack(pady=10)
             
             ttk.Button(
@@ -926,14 +1210,27 @@ class MainApplication:
             ).pack(pady=20)
     
     def create_history_tab(self, notebook):
-        """Crear tab de historial"""
+        """Crear tab de historial (vacío; se construye al mostrarse)"""
         history_frame = ttk.Frame(notebook, padding="20")
         notebook.add(history_frame, text="📊 Historial")
+        self.history_frame = history_frame
+        # Builders pendientes por id de pestaña; _on_tab_changed los consume
+        self._tab_builders = {str(history_frame): self._build_history_tab}
+
+    def _on_tab_changed(self, event):
+        """Construir el contenido de la pestaña seleccionada la primera vez"""
+        builder = self._tab_builders.pop(self.notebook.select(), None)
+        if builder:
+            builder()
+
+    def _build_history_tab(self):
+        """Poblar el historial: consulta a BD + Treeview"""
+        history_frame = self.history_frame
 
         ttk.Label(
             history_frame,
             text="Historial de Sesiones",
-            font=('Arial', 16, 'bold')
+            font=self.f_section
         ).pack(pady=(0, 20))
 
         # Obtener historial del usuario
@@ -946,22 +1243,22 @@ class MainApplication:
         tree.heading("status", text="Estado")
         tree.heading("failure_reason", text="Motivo (si falla)")
         tree.heading("ip_address", text="IP")
+        # Anchos fijos: evita que cada insert dispare un re-cálculo de columnas
+        for col in columns:
+            tree.column(col, width=160, stretch=False)
 
+        # Una sola extracción C-level por fila en lugar de cinco .get();
+        # el tree se puebla antes de hacer pack, así no hay relayouts visibles
+        get_row = itemgetter(*columns)
         for log in logs:
-            tree.insert("", "end", values=(
-                log.get("timestamp", ""),
-                log.get("auth_method", ""),
-                log.get("status", ""),
-                log.get("failure_reason", ""),
-                log.get("ip_address", "")
-            ))
+            tree.insert("", "end", values=get_row(log))
         tree.pack(fill=tk.BOTH, expand=True)
 
         if not logs:
             ttk.Label(
                 history_frame,
                 text="No hay historial de autenticaciones para este usuario.",
-                font=('Arial', 11),
+                font=self.f_body,
                 foreground='#7f8c8d'
             ).pack(pady=10)
     
@@ -975,31 +1272,13 @@ class MainApplication:
             # Marcar que el usuario ahora tiene biometría
             self.user['face_registered'] = True
             
-            # Recrear las pestañas para mostrar el estado actualizado
-            # Obtener el notebook
-            for widget in self.root.winfo_children():
-                if isinstance(widget, ttk.Frame):
-                    for child in widget.winfo_children():
-                        if isinstance(child, ttk.Notebook):
-                            # Encontrar y actualizar la pestaña biométrica
-                            for tab_id in child.tabs():
-                                tab_text = child.tab(tab_id, "text")
-                                if "Configuración Biométrica" in tab_text:
-                                    # Obtener el frame de la pestaña biométrica
-                                    bio_frame = child.nametowidget(tab_id)
-                                    
-                                    # Limpiar contenido actual
-                                    for widget in bio_frame.winfo_children():
-                                        widget.destroy()
-                                    
-                                    # Recrear contenido con estado actualizado
-                                    self._recreate_biometric_tab_content(bio_frame)
-                                    
-                                    print("✅ DEBUG: Pestaña biométrica actualizada automáticamente")
-                                    break
-                            break
-                    break
-                    
+            # Recrear solo la pestaña biométrica usando la referencia cacheada
+            # en setup_ui (sin recorrer el árbol de widgets)
+            for widget in self.bio_frame.winfo_children():
+                widget.destroy()
+            self._recreate_biometric_tab_content(self.bio_frame)
+            print("✅ DEBUG: Pestaña biométrica actualizada automáticamente")
+            
         except Exception as e:
             print(f"❌ DEBUG: Error actualizando interfaz biométrica: {e}")
     
@@ -1008,28 +1287,28 @@ class MainApplication:
         ttk.Label(
             bio_frame,
             text="Gestión de Autenticación Facial",
-            font=('Arial', 16, 'bold')
+            font=self.f_section
         ).pack(pady=(0, 20))
         
         # Mostrar estado actualizado (ahora con biometría)
         ttk.Label(
             bio_frame,
             text="✅ Ya tienes configurada la autenticación facial",
-            font=('Arial', 12),
+            font=self.f_status,
             foreground='#27ae60'
         ).pack(pady=10)
         
         ttk.Label(
             bio_frame,
             text="🎉 Tu biometría se ha registrado correctamente",
-            font=('Arial', 11),
+            font=self.f_body,
             foreground='#2ecc71'
         ).pack(pady=5)
         
         ttk.Label(
             bio_frame,
             text="Ahora puedes cerrar sesión y usar reconocimiento facial para iniciar sesión",
-            font=('Arial', 10),
+            font=self.f_small,
             foreground='#7f8c8d'
         ).pack(pady=10)
         
@@ -1058,18 +1337,52 @@ class BiometricSetupWindow:
         # Número de muestras requeridas para registro biométrico
         self.required_samples = 5  # Puedes ajustar este valor según lo necesario
         self.samples_captured = 0
+        # Frame anterior y buffer de diferencias para la compuerta de
+        # movimiento (evita el hasattr por muestra y el temporal de absdiff)
+        self.previous_frame = None
+        self._diff_buf = None
+        # Acumulador online del encoding promedio: suma corriente + contador
+        # en lugar de materializar la lista de muestras
+        self._enc_sum = None
+        self._enc_count = 0
+        # PhotoImage persistente y buffer RGB del preview (se crean al
+        # activar la cámara, cuando cv2/PIL ya están cargados)
+        self._tk_img = None
+        self._rgb_buf = None
+        # Hilo capturador: escribe el último frame en un slot protegido por
+        # lock para que camera.read() (~33ms en V4L2) no bloquee el loop de Tk
+        self._latest = None
+        self._frame_lock = threading.Lock()
+        # Última caja facial detectada por el feed (coords del preview
+        # 400x280) y su timestamp, para recortar el ROI al encodear
+        self._last_face = None
+        self._last_face_ts = 0.0
+        # Decimación de detección: Haar solo cada 3 ticks, cajas cacheadas
+        # entre medio (la cabeza no se mueve en 50ms, el blit sí corre siempre)
+        self._det_tick = 0
+        self._cached_faces = []
+        # Gating de pintado: subir píxeles a Tcl como mucho a 30Hz y no
+        # reconfigurar el label de estado si el texto no cambió
+        self._last_paint = 0.0
+        self._last_face_status = None
+        # Id del after() pendiente del feed, para cancelarlo al cerrar
+        self._tick_after_id = None
+        self._grab_thread = None
+        self._stop_evt = threading.Event()
         self.setup_ui()
         
     def cleanup(self):
         """Limpiar recursos antes de cerrar"""
         try:
-            if self.camera_active and self.camera:
+            if self.camera:
                 self.stop_camera()
         except:
             pass
     
     def on_closing(self):
         """Manejar cierre de ventana"""
+        self._alive = False
+        self._cancel_feed_tick()
         self.cleanup()
         if hasattr(self, 'root'):
             self.root.quit()
@@ -1077,6 +1390,9 @@ class BiometricSetupWindow:
     
     def setup_ui(self):
         """Configurar interfaz de usuario"""
+        # Bandera de vida: evita sondear winfo_exists (ida y vuelta al
+        # intérprete Tcl) en cada tick del feed
+        self._alive = True
         self.root = tk.Toplevel()
         self.root.title("Configuración Biométrica")
         self.root.geometry("800x700")
@@ -1209,12 +1525,28 @@ class BiometricSetupWindow:
     def start_camera(self):
         """Iniciar cámara con mejor manejo de errores"""
         try:
-            self.camera = cv2.VideoCapture(0)
+            _load_vision()
+            # Reusar el dispositivo si ya quedó abierto de un intento
+            # anterior: VideoCapture puede tardar segundos en abrir/cerrar
+            # y algunos backends pierden memoria en cada ciclo
+            if self.camera is None or not self.camera.isOpened():
+                self.camera = _open_camera()
             if not self.camera.isOpened():
                 self.show_status("❌ Error: No se pudo acceder a la cámara", "error")
                 return
             
             self.camera_active = True
+            # PhotoImage única reutilizada con paste(): evita crear un pixmap
+            # Tcl nuevo cada 30ms, igual que en la ventana de login
+            if self._tk_img is None:
+                self._tk_img = ImageTk.PhotoImage(Image.new('RGB', (400, 280)))
+                self._rgb_buf = np.empty((280, 400, 3), np.uint8)
+                self._gray_buf = np.empty((280, 400), np.uint8)
+                self._small_buf = np.empty((280, 400, 3), np.uint8)
+            self.camera_label.configure(image=self._tk_img, text='')
+            self._stop_evt.clear()
+            self._grab_thread = threading.Thread(target=self._grab_loop, daemon=True)
+            self._grab_thread.start()
             self.start_btn.configure(state=tk.DISABLED)
             self.start_registration_btn.configure(state=tk.NORMAL)
             self.update_camera_feed()
@@ -1229,38 +1561,41 @@ class BiometricSetupWindow:
     
     def update_camera_feed(self):
         """Actualizar feed con detección facial en tiempo real"""
-        # Verificar que la ventana y componentes existan
-        if not hasattr(self, 'root') or not self.root.winfo_exists():
-            return
-            
-        if not hasattr(self, 'camera_label') or not self.camera_label.winfo_exists():
-            return
-            
-        if not self.camera_active or not self.camera:
+        if not self._alive or not self.camera_active or not self.camera:
             return
         
-        ret, frame = self.camera.read()
-        if ret:
-            frame = cv2.resize(frame, (400, 280))  # Tamaño más compacto
-            display_frame = frame.copy()
+        # El usuario no percibe más de ~30 cuadros/s: si el último paste fue
+        # hace menos de 1/30s, reintentar en breve sin tocar Tcl
+        now = time.monotonic()
+        if now - self._last_paint < 1.0 / 30.0:
+            self._tick_after_id = self.root.after(5, self.update_camera_feed)
+            return
+        self._last_paint = now
+        
+        frame = self._latest_frame()
+        if frame is not None:
+            # Resize y conversión a gris sobre buffers preasignados: cero
+            # allocations por frame en el camino de display
+            frame = cv2.resize(frame, (400, 280), dst=self._small_buf)  # Tamaño más compacto
+            display_frame = frame
             
-            # Detectar rostros con parámetros más permisivos
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            try:
-                faces = self.auth_system.face_encoder.face_cascade.detectMultiScale(
-                    gray, 
-                    scaleFactor=1.1,   # Valor más seguro
-                    minNeighbors=3,    # Menos restrictivo
-                    minSize=(40, 40),  # Tamaño mínimo reducido
-                    maxSize=(300, 300) # Tamaño máximo para evitar errores
-                )
-            except cv2.error as e:
-                print(f"⚠️ DEBUG: Error en detección de registro: {e}")
-                faces = []
+            # Detectar rostros con parámetros más permisivos, solo cada
+            # 3er tick; entre medio se reusan las cajas cacheadas
+            self._det_tick += 1
+            if self._det_tick % 3 == 1:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+                try:
+                    self._cached_faces = self._detect_faces(gray)
+                except cv2.error as e:
+                    print(f"⚠️ DEBUG: Error en detección de registro: {e}")
+                    self._cached_faces = []
+            faces = self._cached_faces
             
             # Dibujar bounding boxes
             if len(faces) > 0:
                 self.face_detected = True
+                self._last_face = faces[0]
+                self._last_face_ts = time.monotonic()
                 for (x, y, w, h) in faces:
                     if self.registering:
                         color = (255, 165, 0)  # Naranja durante registro
@@ -1276,33 +1611,93 @@ class BiometricSetupWindow:
                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
                 
                 if not self.registering:
-                    self.face_status_label.configure(
-                        text="✅ Rostro detectado - Listo para registrar",
-                        foreground='#27ae60'
-                    )
+                    self._set_face_status("✅ Rostro detectado - Listo para registrar", '#27ae60')
             else:
                 self.face_detected = False
                 if not self.registering:
-                    self.face_status_label.configure(
-                        text="👤 Posiciónate frente a la cámara",
-                        foreground='#f39c12'
-                    )
+                    self._set_face_status("👤 Posiciónate frente a la cámara", '#f39c12')
             
-            # Convertir y mostrar
-            frame_rgb = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-            image = Image.fromarray(frame_rgb)
-            photo = ImageTk.PhotoImage(image)
-            
-            self.camera_label.configure(image=photo, text='')
-            self.camera_label.image = photo
-        
-        if self.camera_active and hasattr(self, 'root') and self.root.winfo_exists():
+            # Convertir y pegar sobre la PhotoImage persistente
+            cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+            self._tk_img.paste(Image.frombuffer(
+                'RGB', (400, 280), self._rgb_buf.tobytes(), 'raw', 'RGB', 0, 1))
+        
+        if self._alive and self.camera_active:
+            # 16ms: el callback solo dibuja, la captura vive en el hilo
+            self._tick_after_id = self.root.after(16, self.update_camera_feed)
+    
+    def _cancel_feed_tick(self):
+        """Cancelar el after() pendiente del feed antes de destruir la raíz"""
+        if self._tick_after_id is not None:
             try:
-                self.root.after(30, self.update_camera_feed)
+                self.root.after_cancel(self._tick_after_id)
             except tk.TclError:
-                # La ventana fue cerrada, detener la actualización
                 pass
-    
+            self._tick_after_id = None
+
+    def _set_face_status(self, text, color):
+        """Actualizar el label de estado solo si el texto cambió (cada
+        configure es una llamada al intérprete Tcl)"""
+        if text != self._last_face_status:
+            self._last_face_status = text
+            self.face_status_label.configure(text=text, foreground=color)
+
+    def _grab_loop(self):
+        """Hilo de captura: deja siempre el último frame en el slot.
+
+        grab() avanza el stream sin decodificar; retrieve() (la parte
+        cara) solo corre cuando el consumidor ya vació el slot — los
+        frames que nadie va a mirar no pagan la decodificación.
+        """
+        while self.camera_active and not self._stop_evt.is_set():
+            try:
+                if not self.camera.grab():
+                    time.sleep(0.01)
+                    continue
+                with self._frame_lock:
+                    pending = self._latest is not None
+                if pending:
+                    continue
+                ret, frame = self.camera.retrieve()
+            except cv2.error:
+                break
+            if ret:
+                with self._frame_lock:
+                    self._latest = frame
+
+    def _latest_frame(self):
+        """Consumir el frame más reciente del slot (None si no hay nuevo)"""
+        with self._frame_lock:
+            frame = self._latest
+            self._latest = None
+        return frame
+
+    def _pause_camera(self):
+        """Pausar el flujo de frames sin liberar el dispositivo"""
+        self.camera_active = False
+        self._stop_evt.set()
+        if self._grab_thread is not None and self._grab_thread.is_alive():
+            self._grab_thread.join(timeout=0.5)
+        self._grab_thread = None
+        with self._frame_lock:
+            self._latest = None
+
+    def stop_camera(self):
+        """Detener hilo de captura y liberar la cámara en orden"""
+        self._pause_camera()
+        if self.camera:
+            self.camera.release()
+            self.camera = None
+
+    def _detect_faces(self, gray):
+        """Detectar rostros sobre el gris a mitad de resolución (4x menos
+        píxeles para las etapas Haar) con los parámetros permisivos del
+        registro; las cajas se re-escalan a las coords del frame de 400x280"""
+        small = cv2.resize(gray, (200, 140))
+        # (20, 20) equivale a (40, 40) en el frame completo
+        faces = self.auth_system.face_encoder.detect(small, 1.1, 3, (20, 20), (150, 150))
+        return [(x * 2, y * 2, w * 2, h * 2) for (x, y, w, h) in faces]
+
     def start_registration(self):
         """Iniciar proceso de registro automático"""
         print(f"🔍 DEBUG: Intentando iniciar registro - camera_active: {self.camera_active}, face_detected: {self.face_detected}")
@@ -1311,20 +1706,20 @@ class BiometricSetupWindow:
             self.show_status("❌ Primero activa la cámara", "error")
             return
         
-        # Verificar detección facial en tiempo real antes de proceder
-        current_faces_detected = False
-        if self.camera and self.camera.isOpened():
-            ret, frame = self.camera.read()
-            if ret:
+        # Usar la última detección del feed (que corre en cada frame) en
+        # lugar de repetir read + cvtColor + detectMultiScale en el click
+        current_faces_detected = (
+            self.face_detected and self._last_face is not None
+            and time.monotonic() - self._last_face_ts < 0.3
+        )
+        if not current_faces_detected:
+            # Detección vieja (>300ms): re-verificar una sola vez sobre el
+            # último frame del slot
+            frame = self._latest_frame()
+            if frame is not None:
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 try:
-                    faces = self.auth_system.face_encoder.face_cascade.detectMultiScale(
-                        gray, 
-                        scaleFactor=1.1,   # Valor más seguro
-                        minNeighbors=3,    # Menos restrictivo
-                        minSize=(40, 40),  # Tamaño mínimo más pequeño
-                        maxSize=(300, 300) # Tamaño máximo para evitar errores
-                    )
+                    faces = self.auth_system.face_encoder.detect(gray, 1.1, 3, (40, 40), (300, 300))
                 except cv2.error as e:
                     print(f"⚠️ DEBUG: Error en verificación de rostro: {e}")
                     faces = []
@@ -1339,6 +1734,8 @@ class BiometricSetupWindow:
         
         self.registering = True
         self.samples_captured = 0
+        self._enc_sum = None
+        self._enc_count = 0
         self.start_registration_btn.configure(state=tk.DISABLED)
         self.cancel_btn.configure(text="⏹ Detener", command=self.stop_registration)
         
@@ -1357,8 +1754,8 @@ class BiometricSetupWindow:
             return
         
         try:
-            ret, frame = self.camera.read()
-            if not ret:
+            frame = self._latest_frame()
+            if frame is None:
                 self.show_status("❌ Error capturando imagen", "error")
                 self.root.after(500, self.capture_sample)  # Reintentar
                 return
@@ -1387,9 +1784,14 @@ class BiometricSetupWindow:
                 return
             
             # Verificar si hay movimiento (comparar con frame anterior si existe)
-            if hasattr(self, 'previous_frame'):
-                diff = cv2.absdiff(gray, self.previous_frame)
-                movement = np.mean(diff)
+            if self.previous_frame is not None:
+                # Resta con signo sobre un buffer int16 reutilizable: una
+                # pasada menos sobre el frame que absdiff + mean separados
+                if self._diff_buf is None or self._diff_buf.shape != gray.shape:
+                    self._diff_buf = np.empty(gray.shape, np.int16)
+                np.subtract(gray, self.previous_frame, out=self._diff_buf, dtype=np.int16)
+                np.abs(self._diff_buf, out=self._diff_buf)
+                movement = self._diff_buf.mean()
                 if movement > 15:  # Mucho movimiento
                     self.face_status_label.configure(
                         text="🤚 Mantente quieto - Detectando movimiento",
@@ -1401,17 +1803,70 @@ class BiometricSetupWindow:
             
             self.previous_frame = gray
             
-            # Intentar crear encoding
-            encoding = self.auth_system.face_encoder.encode_face_from_image(frame)
+            # Encodear en el pool de workers: LBP + Gabor + FFT tardan
+            # decenas de ms y congelarían el loop de Tk. No hace falta una
+            # cola: solo hay una muestra en vuelo, la siguiente se agenda
+            # recién cuando llega el resultado
+            future = self.auth_system.executor.submit(
+                self._encode_sample, frame, self._last_face
+            )
+            future.add_done_callback(self._on_sample_encoded)
             
+        except Exception as e:
+            print(f"❌ DEBUG: Error en capture_sample: {e}")
+            self.show_status(f"❌ Error: {e}", "error")
+            self.stop_registration()
+    
+    def _encode_sample(self, frame, last_face):
+        """Crear el encoding de una muestra (corre en el pool de workers).
+
+        Si el feed ya localizó el rostro, encodea solo ese ROI (~10x menos
+        píxeles que el frame entero); si no, cae al frame completo.
+        """
+        encoding = None
+        if last_face is not None:
+            x, y, w, h = last_face
+            # Las cajas vienen en coords del preview 400x280
+            sx = frame.shape[1] / 400.0
+            sy = frame.shape[0] / 280.0
+            x, w = int(x * sx), int(w * sx)
+            y, h = int(y * sy), int(h * sy)
+            pad = int(0.2 * w)
+            roi = frame[max(0, y - pad):y + h + pad,
+                        max(0, x - pad):x + w + pad]
+            if roi.size > 0:
+                roi = cv2.resize(roi, (160, 160))
+                encoding = self.auth_system.face_encoder.encode_face_from_aligned_crop(roi)
+        if encoding is None:
+            encoding = self.auth_system.face_encoder.encode_face_from_image(frame)
+        return encoding
+    
+    def _on_sample_encoded(self, future):
+        """Callback del worker: volver al hilo de Tk con el encoding"""
+        try:
+            encoding = future.result()
+        except Exception as e:
+            print(f"❌ DEBUG: Error encodeando muestra: {e}")
+            encoding = None
+        if self._alive:
+            self.root.after(0, self._apply_sample_result, encoding)
+    
+    def _apply_sample_result(self, encoding):
+        """Aplicar el resultado del encoding sobre la interfaz (hilo de Tk)"""
+        if not self.registering or not self.camera_active:
+            return
+        try:
             if encoding is not None:
                 self.samples_captured += 1
                 print(f"✅ DEBUG: Muestra {self.samples_captured} capturada exitosamente")
                 
-                # Guardar encoding para promediado final
-                if not hasattr(self, 'collected_encodings'):
-                    self.collected_encodings = []
-                self.collected_encodings.append(encoding)
+                # Acumular para el promedio final (memoria constante sin
+                # importar cuántas muestras se pidan)
+                if self._enc_sum is None:
+                    self._enc_sum = np.asarray(encoding, dtype=np.float64).copy()
+                else:
+                    self._enc_sum += encoding
+                self._enc_count += 1
                 
                 # Actualizar interfaz
                 self.progress_bar['value'] = self.samples_captured
@@ -1450,7 +1905,7 @@ class BiometricSetupWindow:
                 self.root.after(1000, self.capture_sample)  # Reintentar en 1 segundo
                 
         except Exception as e:
-            print(f"❌ DEBUG: Error en capture_sample: {e}")
+            print(f"❌ DEBUG: Error aplicando muestra: {e}")
             self.show_status(f"❌ Error: {e}", "error")
             self.stop_registration()
     
@@ -1458,21 +1913,20 @@ class BiometricSetupWindow:
         """Completar registro promediando múltiples encodings"""
         try:
             self.show_status("🧮 Calculando encoding promedio...", "info")
-            
-            if not hasattr(self, 'collected_encodings') or len(self.collected_encodings) == 0:
+
+            if self._enc_sum is None or self._enc_count == 0:
                 self.show_status("❌ Error: No hay encodings válidos", "error")
                 self.stop_registration()
                 return
-            
+
             # Calcular encoding promedio para mayor precisión
-            encoding_matrix = np.array(self.collected_encodings)
-            averaged_encoding = np.mean(encoding_matrix, axis=0)
-            
-            print(f"✅ DEBUG: Promediando {len(self.collected_encodings)} encodings")
+            averaged_encoding = self._enc_sum / self._enc_count
+
+            print(f"✅ DEBUG: Promediando {self._enc_count} encodings")
             print(f"📊 DEBUG: Encoding final tiene {len(averaged_encoding)} dimensiones")
             
-            # Normalizar el encoding final
-            averaged_encoding = (averaged_encoding - np.mean(averaged_encoding)) / (np.std(averaged_encoding) + 1e-10)
+            # Normalizar el encoding final (kernel de una pasada)
+            averaged_encoding = znorm(averaged_encoding)
             
             self.complete_registration(averaged_encoding)
             
@@ -1486,24 +1940,39 @@ class BiometricSetupWindow:
         print("🔄 DEBUG: Iniciando complete_registration...")
         self.show_status("💾 Guardando datos biométricos...", "info")
         
+        print(f"🔄 DEBUG: Llamando register_face_biometric para usuario {self.user_id}")
+        print(f"🔄 DEBUG: Encoding shape: {final_encoding.shape if hasattr(final_encoding, 'shape') else 'No shape'}")
+        
+        # Registrar en base de datos desde el pool de workers: la escritura
+        # (bcrypt/red/fsync) no congela el feed de la cámara ni el loop de Tk
+        future = self.auth_system.executor.submit(
+            self.auth_system.register_face_biometric, self.user_id, final_encoding
+        )
+        future.add_done_callback(self._on_biometric_saved)
+    
+    def _on_biometric_saved(self, future):
+        """Callback del worker: volver al hilo de Tk con el resultado"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        if self._alive:
+            self.root.after(0, self._handle_registration_result, result)
+    
+    def _handle_registration_result(self, result):
+        """Aplicar el resultado del guardado sobre la interfaz (hilo de Tk)"""
         try:
-            print(f"🔄 DEBUG: Llamando register_face_biometric para usuario {self.user_id}")
-            print(f"🔄 DEBUG: Encoding shape: {final_encoding.shape if hasattr(final_encoding, 'shape') else 'No shape'}")
-            
-            # Registrar en base de datos
-            result = self.auth_system.register_face_biometric(self.user_id, final_encoding)
-            
             print(f"🔄 DEBUG: Resultado de register_face_biometric: {result}")
             
             if result and result.get('success'):
                 print("✅ DEBUG: Registro en BD exitoso, iniciando cierre automático...")
                 self.registering = False
                 
-                # Desactivar cámara inmediatamente
+                # Pausar el flujo de frames; el dispositivo se libera una
+                # sola vez al cerrar la ventana
                 if self.camera_active and self.camera:
-                    self.camera_active = False
-                    self.camera.release()
-                    print("📹 DEBUG: Cámara desactivada")
+                    self._pause_camera()
+                    print("📹 DEBUG: Cámara pausada")
                 
                 # Mensaje de confirmación claro y específico
                 self.show_status("✅ Biometría del usuario registrada con éxito", "success")
@@ -1542,7 +2011,7 @@ class BiometricSetupWindow:
                 self.stop_registration()
                 
         except Exception as e:
-            print(f"❌ DEBUG: Excepción en complete_registration: {e}")
+            print(f"❌ DEBUG: Excepción aplicando resultado de registro: {e}")
             import traceback
             traceback.print_exc()
             self.show_status(f"❌ Error: {e}", "error")
@@ -1573,6 +2042,9 @@ class BiometricSetupWindow:
     def stop_registration(self):
         """Detener proceso de registro"""
         self.registering = False
+        # El registro escribe el label de estado directamente: invalidar el
+        # cacheado para que el feed vuelva a pintarlo
+        self._last_face_status = None
         self.start_registration_btn.configure(state=tk.NORMAL)
         self.cancel_btn.configure(text="❌ Cancelar", command=self.close_window)
         
@@ -1597,9 +2069,11 @@ class BiometricSetupWindow:
     
     def close_window(self):
         """Cerrar ventana y limpiar recursos"""
-        if self.camera_active and self.camera:
-            self.camera_active = False
-            self.camera.release()
+        self._alive = False
+        self._cancel_feed_tick()
+        # Liberar también si la cámara quedó pausada (dispositivo abierto)
+        if self.camera:
+            self.stop_camera()
         
         self.root.destroy()
 